@@ -0,0 +1,110 @@
+"""bench_codec.py
+
+Compare the codec modes of src/codec.py (exact: pure-Python PyYAML and
+json; fast: libyaml and orjson when available; compact: fast with
+unindented JSON) on generated data:
+
+- a deep and a wide outline (as in bench_suite.py): dumping the parsed
+  outline as YAML (txt_yml), emitting it while parsing (txt_yml --stream),
+  loading the YAML (yml_json, yml_txt) and writing it as JSON (yml_json)
+- generated study records (as in bench_json_sql_memory.py) through the
+  same YAML and JSON steps
+
+For each step the time per mode, the speedup over exact and whether the
+output matches exact byte for byte or only as data are printed.
+
+Usage:
+    python bench/bench_codec.py --size-mb 5 --studies 5000
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from importlib.util import find_spec
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import yaml  # noqa: E402
+
+from bench_json_sql_memory import make_studies  # noqa: E402
+from bench_txt_yml import write_outline  # noqa: E402
+from src import codec, txt_yml  # noqa: E402
+
+
+def timed(mode, fn):
+    codec.set_mode(mode)
+    t0 = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t0, result
+
+
+def compare(label, fn, fmt, modes=('exact', 'fast')):
+    """Time fn in each mode; fmt is 'yaml' or 'json' for text output, None for loaded data."""
+    times, outputs = {}, {}
+    for mode in modes:
+        times[mode], outputs[mode] = timed(mode, fn)
+    line = f'{label:<24} exact {times["exact"]:7.2f} s'
+    for mode in modes[1:]:
+        if fmt is None:
+            match = 'same data' if outputs[mode] == outputs['exact'] else 'DIFFERENT'
+        elif outputs[mode] == outputs['exact']:
+            match = 'identical'
+        else:
+            # the pure-Python loaders are the reference
+            load = json.loads if fmt == 'json' else yaml.safe_load
+            match = 'same data' if load(outputs[mode]) == load(outputs['exact']) else 'DIFFERENT'
+        line += f'  {mode} {times[mode]:7.2f} s x{times["exact"] / times[mode]:4.1f} ({match})'
+    print(line)
+
+
+def dump_yaml(data):
+    out = io.StringIO()
+    codec.yaml_dump(data, out)
+    return out.getvalue()
+
+
+def dump_json(data):
+    out = io.StringIO()
+    codec.json_dump(data, out)
+    return out.getvalue()
+
+
+def bench_dataset(name, data, outline_path=None):
+    """Run the YAML and JSON steps on data, and the streaming emitter on outline_path."""
+    codec.set_mode('exact')
+    text = dump_yaml(data)
+    print(f'{name}: {len(text.encode("utf-8")) / 2**20:.1f} MB of YAML')
+    compare('  yaml dump', lambda: dump_yaml(data), 'yaml')
+    if outline_path is not None:
+        def emit():
+            out = io.StringIO()
+            with open(outline_path, 'r', encoding='utf-8') as f:
+                txt_yml.stream_markdown_to_yaml(f, out)
+            return out.getvalue()
+        compare('  yaml emit (stream)', emit, 'yaml')
+    compare('  yaml load', lambda: codec.yaml_load(text), None)
+    compare('  json dump', lambda: dump_json(data), 'json', ('exact', 'fast', 'compact'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the YAML/JSON codec modes')
+    parser.add_argument('--size-mb', type=float, default=5, help='size of each generated outline')
+    parser.add_argument('--studies', type=int, default=5000, help='generated study records')
+    args = parser.parse_args()
+
+    print(f'libyaml: {yaml.__with_libyaml__}, orjson: {find_spec("orjson") is not None}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, depth, fanout in (('deep outline', 12, 2), ('wide outline', 2, 200)):
+            path = Path(tmp) / f'{name.split()[0]}.txt'
+            write_outline(path, args.size_mb, depth=depth, fanout=fanout)
+            with open(path, 'r', encoding='utf-8') as f:
+                data = txt_yml.parse_markdown_to_dict(f)
+            bench_dataset(f'{name} ({os.path.getsize(path) / 2**20:.1f} MB)', data, path)
+        bench_dataset(f'{args.studies} studies', list(make_studies(args.studies)))
@@ -0,0 +1,70 @@
+"""bench_import_time.py
+
+Check the start-up cost of main.py with python -X importtime.
+
+Each command runs in a fresh interpreter several times; the best
+cumulative import time of main (and, for planning, src.planner) is
+compared with a budget. Start-up must also not import any converter
+dependency: those belong inside the conversions that need them.
+Exits with status 1 if a budget is exceeded or a heavy module is loaded.
+
+Usage:
+    python bench/bench_import_time.py --budget-ms 40 --repeat 5
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# nothing may import these until a conversion runs
+HEAVY_MODULES = ('yaml', 'pandas', 'numpy', 'psycopg2', 'sqlite3', 'zstandard', 'multiprocessing',
+                 'src.txt_yml', 'src.yml_json', 'src.json_sql', 'src.json_db', 'src.csv_sql', 'src.sql_csv',
+                 'src.xlsx_csv', 'src.xlsx_sql', 'src.yml_txt')
+
+# name -> code run by the interpreter under -X importtime
+SCENARIOS = {
+    'import main': 'import main',
+    # building the format graph must not import converters
+    'plan txt -> db': 'import main; from src.planner import plan; plan("txt", "db")',
+}
+
+
+def import_times(code):
+    """Run code in a fresh interpreter; return {module: cumulative microseconds}."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # nested imports are indented; the module names are what matter
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark main.py import time')
+    parser.add_argument('--budget-ms', type=float, default=40.0, help='allowed cumulative import time of main')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per scenario; the fastest counts')
+    parser.add_argument('--top', type=int, default=8, help='slowest imports to list')
+    args = parser.parse_args()
+
+    failed = False
+    for name, code in SCENARIOS.items():
+        runs = [import_times(code) for _ in range(args.repeat)]
+        best = min(runs, key=lambda t: sum(t[m] for m in ('main', 'src.planner') if m in t))
+        total_ms = sum(best[m] for m in ('main', 'src.planner') if m in best) / 1000
+        heavy = [m for m in HEAVY_MODULES if m in best]
+        ok = total_ms <= args.budget_ms and not heavy
+        failed |= not ok
+        print(f'{"ok" if ok else "FAILED":>6}  {name:<16} {total_ms:7.1f} ms (budget {args.budget_ms:.0f} ms)')
+        if heavy:
+            print(f'        heavy modules imported: {", ".join(heavy)}')
+        for mod, us in sorted(best.items(), key=lambda kv: -kv[1])[:args.top]:
+            print(f'        {us / 1000:7.1f} ms  {mod}')
+
+    sys.exit(1 if failed else 0)
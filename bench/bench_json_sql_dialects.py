@@ -0,0 +1,49 @@
+"""bench_json_sql_dialects.py
+
+Render generated study records in each json_sql output dialect and time
+loading the script into a fresh local SQLite database. The Postgres COPY
+dialect is rendered for size only, since SQLite cannot execute it.
+
+Usage:
+    python bench/bench_json_sql_dialects.py --studies 5000
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import json_sql  # noqa: E402
+from bench_json_sql_memory import make_studies  # noqa: E402
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark json_sql dialect load times')
+    parser.add_argument('--studies', type=int, default=5000, help='number of generated studies')
+    parser.add_argument('--batch-size', type=int, default=500, help='rows per multi-row INSERT')
+    args = parser.parse_args()
+
+    tb = json_sql.TableBuilder()
+    for study in make_studies(args.studies):
+        json_sql._walk(tb, study, 'root')
+    print(f'{sum(tb.counters.values())} rows in {len(tb.tables)} tables')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for dialect in json_sql.SQL_DIALECTS:
+            t0 = time.perf_counter()
+            sql, _ = tb.build_sql('bench', dialect, args.batch_size)
+            render = time.perf_counter() - t0
+            line = f'{dialect:<9} {len(sql.encode()) / (1024 * 1024):8.1f} MB  render {render:6.2f} s'
+            if dialect != 'copy':
+                db = os.path.join(tmp, f'{dialect}.db')
+                conn = sqlite3.connect(db)
+                t0 = time.perf_counter()
+                conn.executescript(sql)
+                line += f'  load {time.perf_counter() - t0:6.2f} s'
+                conn.close()
+            print(line)
@@ -0,0 +1,84 @@
+"""bench_json_sql_memory.py
+
+Compare TableBuilder's columnar storage with the previous layout (a list
+of per-row dicts per table) on generated study records.
+
+Usage:
+    python bench/bench_json_sql_memory.py --studies 20000
+"""
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import json_sql  # noqa: E402
+
+
+class DictRowBuilder(json_sql.TableBuilder):
+    """TableBuilder with the old list-of-dicts row storage."""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = defaultdict(list)
+
+    def add_row(self, table, row, parent_table=None):
+        self.counters[table] += 1
+        # same parent bookkeeping as TableBuilder.add_row
+        if parent_table is not None and self.parents.setdefault(table, parent_table) != parent_table:
+            self.parents[table] = None
+        row = dict(row)
+        row['id'] = self.counters[table]
+        self.rows[table].append(row)
+        return row['id']
+
+
+def make_studies(n, seed=0):
+    rng = random.Random(seed)
+    interventions = ['placebo', 'drug A', 'drug B', 'exercise', 'diet']
+    for i in range(n):
+        yield {
+            'study_id': f'Author{i % 997} ({2000 + i % 25})',
+            'year': 2000 + i % 25,
+            'n': rng.randint(10, 5000),
+            'arms': [
+                {
+                    'intervention': rng.choice(interventions),
+                    'n': rng.randint(5, 2500),
+                    'age_mean': round(rng.uniform(18, 80), 1),
+                    'age_sd': round(rng.uniform(1, 15), 1),
+                    'outcomes': [{'name': f'outcome {k}', 'value': rng.random()} for k in range(4)],
+                }
+                for _ in range(rng.randint(2, 4))
+            ],
+        }
+
+
+def measure(label, builder_cls, studies):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    tb = builder_cls()
+    for study in studies:
+        json_sql._walk(tb, study, 'root')
+    elapsed = time.perf_counter() - t0
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    rows = sum(tb.counters.values())
+    print(f'{label:<8} {rows:>9} rows  {current / (1024 * 1024):8.1f} MB  '
+          f'{current / rows:6.1f} B/row  {elapsed:6.2f} s')
+    return tb
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark TableBuilder memory')
+    parser.add_argument('--studies', type=int, default=20000, help='number of generated studies')
+    args = parser.parse_args()
+
+    studies = list(make_studies(args.studies))
+    measure('dicts', DictRowBuilder, studies)
+    measure('columns', json_sql.TableBuilder, studies)
@@ -0,0 +1,275 @@
+"""bench_suite.py
+
+Benchmark every converter on generated data and store the results as JSON.
+
+Inputs are generated once per run:
+- deep and wide outlines (txt_yml), and the YAML they convert to (yml_json,
+  yml_txt)
+- a large nested JSON array of study records (json_sql)
+- a wide CSV whose columns repeat the data/csv/study_characteristics.csv
+  header (csv_sql), and the same rows in SQLite behind a SELECT (sql_csv)
+- the same rows as an .xlsx workbook with shared strings (xlsx_csv, xlsx_sql)
+
+Each case runs in a fresh interpreter so its peak RSS is its own. The
+database steps use an SQLite file in place of Postgres. Results are
+written to bench/results/<timestamp>.json for tracking over time: time,
+MB/s of data converted (the exported CSV for sql_csv), peak RSS and
+output size, with the git commit and Python version.
+
+Usage:
+    python bench/bench_suite.py --scale 1
+    python bench/bench_suite.py --scale 0.1 --cases txt_yml_deep json_sql
+    python bench/bench_suite.py --cases csv_sql sql_csv --pipeline-depth 0
+    python bench/bench_suite.py --cases txt_yml_deep yml_json --codec exact
+"""
+
+import argparse
+import csv
+import json
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src import codec  # noqa: E402
+from src.instrument import max_rss_bytes  # noqa: E402
+
+SCHEMA_CSV = ROOT / 'data' / 'csv' / 'study_characteristics.csv'
+INTERVENTIONS = ['placebo', 'drug A', 'drug B', 'exercise', 'diet']
+
+# case -> (converter module, input file, output file) inside the work directory
+CASES = {
+    'txt_yml_deep': ('txt_yml', 'deep.txt', 'deep.yml'),
+    'txt_yml_wide': ('txt_yml', 'wide.txt', 'wide.yml'),
+    'yml_json': ('yml_json', 'deep.yml', 'deep.json'),
+    'yml_txt': ('yml_txt', 'deep.yml', 'deep_out.txt'),
+    'json_sql': ('json_sql', 'studies.json', 'studies.sql'),
+    'csv_sql': ('csv_sql', 'wide.csv', 'wide.sql'),
+    'sql_csv': ('sql_csv', 'select.sql', 'select.csv'),
+    'xlsx_csv': ('xlsx_csv', 'wide.xlsx', 'wide_xlsx.csv'),
+    'xlsx_sql': ('xlsx_sql', 'wide.xlsx', 'wide_xlsx.sql'),
+}
+# cases whose data volume is the output rather than the input
+OUTPUT_SIZED = {'sql_csv'}
+
+
+def write_studies_json(path: Path, n: int, seed: int = 0):
+    """Write n generated study records as one JSON array, item by item."""
+    from bench_json_sql_memory import make_studies
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for i, study in enumerate(make_studies(n, seed)):
+            f.write(',\n' if i else '\n')
+            json.dump(study, f)
+        f.write('\n]\n')
+
+
+def wide_header(width: int):
+    """The study_characteristics columns, repeated with _2, _3, ... suffixes up to width."""
+    with open(SCHEMA_CSV, newline='', encoding='utf-8-sig') as f:
+        base = next(csv.reader(f))
+    return [c if i < len(base) else f'{c}_{i // len(base) + 1}'
+            for i, c in ((i, base[i % len(base)]) for i in range(width))]
+
+
+def _study_value(rng: random.Random, col: str, row: int):
+    # value generators keyed on the study_characteristics column names
+    name = col.rsplit('_', 1)[0] if col.rsplit('_', 1)[-1].isdigit() else col
+    if name == 'id':
+        return row
+    if name == 'study_id':
+        return f'Author{row % 997} ({2000 + row % 25})'
+    if name == 'intervention':
+        return rng.choice(INTERVENTIONS)
+    if name.startswith('n'):
+        return rng.randint(0, 5000)
+    if name.endswith('_mean'):
+        return round(rng.uniform(1, 80), 1)
+    if name.endswith('_sd'):
+        return round(rng.uniform(0.5, 15), 2)
+    return ''
+
+
+def write_wide_csv(path: Path, rows: int, width: int, seed: int = 0):
+    """Write rows generated from the study_characteristics schema, widened to width columns."""
+    rng = random.Random(seed)
+    header = wide_header(width)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in range(1, rows + 1):
+            writer.writerow([_study_value(rng, c, row) for c in header])
+
+
+def write_wide_xlsx(path: Path, rows: int, width: int, seed: int = 0):
+    """Write the rows of write_wide_csv as a one-sheet workbook, the way Excel stores them."""
+    import zipfile
+    from xml.sax.saxutils import escape
+
+    rng = random.Random(seed)
+    header = wide_header(width)
+    strings = {}
+
+    def cells(r, values):
+        out = []
+        for j, v in enumerate(values):
+            ref = (chr(65 + j // 26 - 1) if j >= 26 else '') + chr(65 + j % 26) + str(r)
+            if isinstance(v, str):
+                if v:
+                    out.append(f'<c r="{ref}" t="s"><v>{strings.setdefault(v, len(strings))}</v></c>')
+            else:
+                out.append(f'<c r="{ref}"><v>{v}</v></c>')
+        return f'<row r="{r}">{"".join(out)}</row>'
+
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    rel = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        with zf.open('xl/worksheets/sheet1.xml', 'w') as f:
+            f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<worksheet {ns}><sheetData>'.encode())
+            f.write(cells(1, header).encode())
+            for row in range(1, rows + 1):
+                f.write(cells(row + 1, [_study_value(rng, c, row) for c in header]).encode())
+            f.write(b'</sheetData></worksheet>')
+        zf.writestr('xl/sharedStrings.xml', f'<?xml version="1.0" encoding="UTF-8"?>\n<sst {ns}>'
+                    + ''.join(f'<si><t>{escape(s)}</t></si>' for s in strings) + '</sst>')
+        zf.writestr('xl/workbook.xml', f'<?xml version="1.0" encoding="UTF-8"?>\n<workbook {ns} xmlns:r="{rel}">'
+                    '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>')
+        zf.writestr('xl/_rels/workbook.xml.rels', '<?xml version="1.0" encoding="UTF-8"?>\n<Relationships '
+                    'xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                    f'<Relationship Id="rId1" Type="{rel}/worksheet" Target="worksheets/sheet1.xml"/>'
+                    f'<Relationship Id="rId2" Type="{rel}/sharedStrings" Target="sharedStrings.xml"/>'
+                    '</Relationships>')
+
+
+def prepare(work: Path, scale: float, cases):
+    """Generate the inputs the selected cases need."""
+    # imported here so the measured child processes do not load them
+    from bench_txt_yml import write_outline
+    from src import csv_sql, txt_yml
+
+    t0 = time.perf_counter()
+    if {'txt_yml_deep', 'yml_json', 'yml_txt'} & set(cases):
+        write_outline(work / 'deep.txt', 20 * scale, depth=12, fanout=2)
+    if {'yml_json', 'yml_txt'} & set(cases):
+        txt_yml.convert('deep', str(work / 'deep.txt'), str(work / 'deep.yml'))
+    if 'txt_yml_wide' in cases:
+        write_outline(work / 'wide.txt', 20 * scale, depth=2, fanout=200)
+    if 'json_sql' in cases:
+        write_studies_json(work / 'studies.json', int(20000 * scale))
+    if {'csv_sql', 'sql_csv'} & set(cases):
+        write_wide_csv(work / 'wide.csv', int(50000 * scale), 60)
+    if {'xlsx_csv', 'xlsx_sql'} & set(cases):
+        write_wide_xlsx(work / 'wide.xlsx', int(50000 * scale), 60)
+    if 'sql_csv' in cases:
+        conn = sqlite3.connect(work / 'bench.db')
+        csv_sql.load_csv(conn, work / 'wide.csv', 'wide', work / 'prepare.sql', backend='sqlite')
+        conn.close()
+        (work / 'select.sql').write_text('SELECT * FROM wide;\n')
+    print(f'inputs generated in {time.perf_counter() - t0:.1f}s')
+
+
+def run_case(case: str, work: Path, pipeline_depth: int = 2):
+    """Run one case in this process and return its measurements."""
+    from importlib import import_module
+    module, in_name, out_name = CASES[case]
+    mod = import_module(f'src.{module}')
+    in_path, out_path = work / in_name, work / out_name
+    kwargs = {}
+    if module in ('csv_sql', 'sql_csv', 'xlsx_sql'):
+        # a fresh SQLite file stands in for Postgres
+        db = work / ('bench.db' if module == 'sql_csv' else f'{case}.db')
+        if module != 'sql_csv':
+            db.unlink(missing_ok=True)
+        kwargs = {'backend': 'sqlite', 'conn': sqlite3.connect(db), 'pipeline_depth': pipeline_depth}
+    base_rss = max_rss_bytes()
+
+    t0 = time.perf_counter()
+    mod.convert(Path(in_name).stem, str(in_path), str(out_path), **kwargs)
+    elapsed = time.perf_counter() - t0
+
+    in_bytes, out_bytes = in_path.stat().st_size, out_path.stat().st_size
+    data_bytes = out_bytes if case in OUTPUT_SIZED else in_bytes
+    return {
+        'case': case,
+        'converter': module,
+        'seconds': round(elapsed, 4),
+        'input_bytes': in_bytes,
+        'output_bytes': out_bytes,
+        'throughput_mb_s': round(data_bytes / (1024 * 1024) / elapsed, 3) if elapsed > 0 else None,
+        'peak_rss_bytes': max_rss_bytes(),
+        'base_rss_bytes': base_rss,
+        'codec': codec.mode(),
+        **({'pipeline_depth': pipeline_depth} if 'pipeline_depth' in kwargs else {}),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark all converters on generated data')
+    parser.add_argument('--scale', type=float, default=1.0, help='input size factor (1 = ~20 MB outlines)')
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=sorted(CASES), help='cases to run')
+    parser.add_argument('--out', default=None, help='results file (default: bench/results/<timestamp>.json)')
+    parser.add_argument('--pipeline-depth', type=int, default=2,
+                        help='chunks parsed ahead of the database in csv_sql/sql_csv (0: no overlap)')
+    parser.add_argument('--codec', choices=codec.MODES, default=None,
+                        help='YAML/JSON codec mode of src/codec.py (default: $DANDOC_CODEC, else fast)')
+    parser.add_argument('--child', nargs=3, metavar=('CASE', 'WORKDIR', 'RESULT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.codec:
+        # inherited by the child processes
+        codec.set_mode(args.codec)
+
+    if args.child:
+        case, work, result = args.child
+        Path(result).write_text(json.dumps(run_case(case, Path(work), args.pipeline_depth)))
+        sys.exit(0)
+
+    started = datetime.now(timezone.utc)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        prepare(work, args.scale, args.cases)
+        for case in args.cases:
+            result_file = work / f'{case}.result.json'
+            proc = subprocess.run([sys.executable, __file__, '--child', case, str(work), str(result_file),
+                                   '--pipeline-depth', str(args.pipeline_depth)],
+                                  cwd=ROOT, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f'{case:<13} FAILED\n{proc.stderr}')
+                results.append({'case': case, 'error': proc.stderr.strip().splitlines()[-1:]})
+                continue
+            r = json.loads(result_file.read_text())
+            results.append(r)
+            rss = f'{r["peak_rss_bytes"] / 2**20:7.1f} MB' if r['peak_rss_bytes'] is not None else '    n/a   '
+            print(f'{case:<13} {r["seconds"]:8.2f} s  {r["throughput_mb_s"]:8.2f} MB/s  '
+                  f'peak RSS {rss}  '
+                  f'{r["input_bytes"] / 2**20:7.1f} MB -> {r["output_bytes"] / 2**20:7.1f} MB')
+
+    out = Path(args.out) if args.out else ROOT / 'bench' / 'results' / f'{started:%Y%m%d-%H%M%S}.json'
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({
+        'started': started.isoformat(),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': args.scale,
+        'codec': codec.mode(),
+        'results': results,
+    }, indent=2) + '\n')
+    print('Results written to', out)
+    sys.exit(1 if any('error' in r for r in results) else 0)
@@ -0,0 +1,75 @@
+"""bench_txt_yml.py
+
+Compare the in-memory dict parser against the streaming parser in
+src/txt_yml.py on a generated outline.
+
+Usage:
+    python bench/bench_txt_yml.py --size-mb 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import txt_yml  # noqa: E402
+
+
+def write_outline(path: Path, size_mb: float, depth: int = 4, fanout: int = 8):
+    """Write a synthetic outline of roughly size_mb megabytes to path."""
+    target = int(size_mb * 1024 * 1024)
+    written = 0
+    n = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        while written < target:
+            for level in range(1, depth + 1):
+                for _ in range(fanout if level == depth else 1):
+                    n += 1
+                    chunk = f"{'#' * level} Section {n}\n- item {n}a\n- item {n}b\nNotes for section {n}.\n\n"
+                    f.write(chunk)
+                    written += len(chunk)
+
+
+def run(label, fn, in_path, out_path, trace):
+    if trace:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    fn(in_path, out_path)
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1] if trace else 0
+    if trace:
+        tracemalloc.stop()
+    size = os.path.getsize(in_path) / (1024 * 1024)
+    line = f'{label:<10} {elapsed:8.2f} s  {size / elapsed:8.2f} MB/s'
+    if trace:
+        line += f'  peak {peak / (1024 * 1024):8.1f} MB'
+    print(line)
+
+
+def dict_mode(in_path, out_path):
+    with open(in_path, 'r', encoding='utf-8') as f, open(out_path, 'w', encoding='utf-8') as out:
+        out.write(txt_yml.markdown_to_yaml(f.readlines()))
+
+
+def stream_mode(in_path, out_path):
+    with open(in_path, 'r', encoding='utf-8') as f, open(out_path, 'w', encoding='utf-8') as out:
+        txt_yml.stream_markdown_to_yaml(f, out)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark txt -> yml parsers')
+    parser.add_argument('--size-mb', type=float, default=200, help='generated outline size')
+    parser.add_argument('--trace', action='store_true', help='measure peak memory (slow)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        in_path = Path(tmp) / 'outline.txt'
+        write_outline(in_path, args.size_mb)
+        print(f'outline: {os.path.getsize(in_path) / (1024 * 1024):.1f} MB')
+        run('dict', dict_mode, in_path, Path(tmp) / 'dict.yml', args.trace)
+        run('stream', stream_mode, in_path, Path(tmp) / 'stream.yml', args.trace)
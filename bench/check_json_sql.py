@@ -0,0 +1,170 @@
+"""check_json_sql.py
+
+Check that json_sql's faster paths give the same result as the plain one,
+on random nested documents:
+
+- sharded: tables built in a process pool (json_file_to_tables with
+  workers) render the same SQL as a serial build, in every dialect
+- diff: a database loaded from one version of a document, updated with
+  the --diff output for the next version, holds the same tables, column
+  types and rows as a fresh load of the next version
+
+Prints one line per check and exits non-zero on the first mismatch.
+
+Usage:
+    python bench/check_json_sql.py --trials 50
+"""
+
+import argparse
+import copy
+import json
+import random
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import json_sql  # noqa: E402
+
+KEYS = ['name', 'n', 'score', 'flag', 'note', 'arms', 'meta', 'tags', 'outcomes']
+NESTED = {'arms', 'meta', 'tags', 'outcomes'}
+
+
+def random_scalar(rng):
+    return rng.choice([
+        None, True, False, rng.randint(-5, 5), rng.randint(-2**40, 2**40), round(rng.uniform(-100, 100), 3),
+        '', 'text', "it's", 'ünïcode', rng.choice(['1', '2.5', 'x']),
+    ])
+
+
+def random_value(rng, key, depth):
+    if key not in NESTED or depth == 0:
+        return random_scalar(rng)
+    if key == 'meta':
+        return random_node(rng, depth - 1)
+    if key == 'tags':
+        return [random_scalar(rng) for _ in range(rng.randint(0, 3))]
+    return [random_node(rng, depth - 1) for _ in range(rng.randint(0, 3))]
+
+
+def random_node(rng, depth):
+    """A dict of scalars with nested dicts and lists (of dicts or scalars) below it."""
+    return {key: random_value(rng, key, depth) for key in rng.sample(KEYS, rng.randint(1, len(KEYS)))}
+
+
+def random_document(rng):
+    return [random_node(rng, rng.randint(0, 3)) for _ in range(rng.randint(0, 60))]
+
+
+def mutate(rng, doc):
+    """A next version of doc: edited, retyped, added and removed values and items."""
+    doc = copy.deepcopy(doc)
+    for _ in range(rng.randint(1, 10)):
+        if doc and rng.random() < 0.7:
+            node = rng.choice(doc)
+            while True:
+                children = [v for v in node.values() if isinstance(v, dict)]
+                children += [i for v in node.values() if isinstance(v, list) for i in v if isinstance(i, dict)]
+                if not children or rng.random() < 0.5:
+                    break
+                node = rng.choice(children)
+            key = rng.choice(KEYS)
+            if key in node and rng.random() < 0.3:
+                del node[key]
+            else:
+                node[key] = random_value(rng, key, rng.randint(0, 2))
+        elif rng.random() < 0.5:
+            doc.insert(rng.randint(0, len(doc)), random_node(rng, 2))
+        elif doc:
+            del doc[rng.randrange(len(doc)) if rng.random() < 0.3 else -1]
+    return doc
+
+
+def write_json(path, doc):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(doc, f)
+
+
+def check_sharded(rng, tmp):
+    path = Path(tmp) / 'doc.json'
+    write_json(path, random_document(rng))
+    serial = json_sql.json_file_to_tables(str(path))
+    shard_size = rng.randint(1, 10)
+    sharded = json_sql.json_file_to_tables(str(path), workers=2, shard_size=shard_size)
+    for dialect in json_sql.SQL_DIALECTS:
+        if sharded.build_sql('root', dialect) != serial.build_sql('root', dialect):
+            return f'{dialect} SQL differs with shard_size {shard_size}'
+    return None
+
+
+def dump_database(db_path):
+    """Map each table to its column types and its rows (as column -> value), in id order."""
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = {}
+        for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                     "AND name NOT LIKE 'sqlite_%'"):
+            types = {name: ctype for _, name, ctype, *_ in conn.execute(f'PRAGMA table_info("{table}")')}
+            cursor = conn.execute(f'SELECT * FROM "{table}" ORDER BY "id"')
+            names = [d[0] for d in cursor.description]
+            tables[table] = (types, [dict(zip(names, row)) for row in cursor])
+        return tables
+    finally:
+        conn.close()
+
+
+def load_sql(db_path, sql_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executescript(Path(sql_path).read_text(encoding='utf-8'))
+    finally:
+        conn.close()
+
+
+def check_diff(rng, tmp):
+    tmp = Path(tmp)
+    old_doc = random_document(rng)
+    new_doc = mutate(rng, old_doc)
+    sql, db, fresh_sql, fresh_db = tmp / 'doc.sql', tmp / 'doc.db', tmp / 'fresh.sql', tmp / 'fresh.db'
+
+    # the first diff run has no snapshot and writes the full load
+    json_sql.json_to_relational_sql(old_doc, str(sql), 'doc', diff=True)
+    load_sql(db, sql)
+    json_sql.json_to_relational_sql(new_doc, str(sql), 'doc', diff=True)
+    load_sql(db, sql)
+
+    json_sql.json_to_relational_sql(new_doc, str(fresh_sql), 'doc')
+    load_sql(fresh_db, fresh_sql)
+
+    updated, fresh = dump_database(db), dump_database(fresh_db)
+    if updated.keys() != fresh.keys():
+        return f'tables differ: {sorted(updated)} != {sorted(fresh)}'
+    for table, (types, rows) in fresh.items():
+        if updated[table][0] != types:
+            return f'columns of {table} differ: {updated[table][0]} != {types}'
+        if updated[table][1] != rows:
+            return f'rows of {table} differ'
+    return None
+
+
+CHECKS = {'sharded': check_sharded, 'diff': check_diff}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check json_sql sharded and diff output against plain output')
+    parser.add_argument('--trials', type=int, default=50, help='random documents per check')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--check', choices=sorted(CHECKS), action='append', help='run only this check')
+    args = parser.parse_args()
+
+    for name in args.check or CHECKS:
+        rng = random.Random(args.seed)
+        for trial in range(args.trials):
+            with tempfile.TemporaryDirectory() as tmp:
+                error = CHECKS[name](rng, tmp)
+            if error:
+                print(f'{name:<8} FAILED on trial {trial} (--seed {args.seed}): {error}')
+                sys.exit(1)
+        print(f'{name:<8} ok   {args.trials} random documents')
@@ -0,0 +1,86 @@
+"""check_planner.py
+
+Check that multi-step conversions through planner.run_chain write the
+same output whichever way their stages run (in memory through the
+chaining hooks, or on files when streaming is on), with and without the
+cache, and that intermediate files are left on disk only when
+keep_intermediates is set.
+
+Each chain converts a generated outline under a temporary data/ layout;
+afterwards data/ must hold only the input, the output, the cache and,
+with keep_intermediates, one file per intermediate format. No scratch
+directory may be left behind. Exits non-zero on the first mismatch.
+
+Usage:
+    python bench/check_planner.py
+"""
+
+import contextlib
+import io
+import sys
+import tempfile
+from itertools import product
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import codec, planner  # noqa: E402
+from src.cache import ConversionCache  # noqa: E402
+
+OUTLINE = '# Study\nAuthor (2020)\n## Arms\n- placebo\n- drug A\n## Outcome\nmortality\n# Notes\ntext\n'
+TARGETS = ('json', 'sql', 'db')
+
+
+def data_files(data_dir):
+    return {p.relative_to(data_dir).as_posix() for p in data_dir.rglob('*')
+            if p.is_file() and '.cache' not in p.parts}
+
+
+def scratch_dirs():
+    return set(Path(tempfile.gettempdir()).glob('dandoc-*'))
+
+
+def check(output_format, stream, cached, keep, tmp, reference):
+    data_dir = Path(tmp) / 'data'
+    (data_dir / 'txt').mkdir(parents=True)
+    input_path = data_dir / 'txt' / 'study.txt'
+    input_path.write_text(OUTLINE, encoding='utf-8')
+    output_path = data_dir / output_format / f'study.{output_format}'
+    chain = planner.plan('txt', output_format)
+    cache = ConversionCache(data_dir / '.cache') if cached else None
+
+    codec.set_streaming(stream)
+    before = scratch_dirs()
+    with contextlib.redirect_stdout(io.StringIO()):
+        planner.run_chain(chain, 'study', str(input_path), str(output_path), keep, cache)
+    if scratch_dirs() - before:
+        return 'scratch directory left behind'
+
+    expected = {'txt/study.txt', f'{output_format}/study.{output_format}'}
+    if keep:
+        expected |= {f'{out_fmt}/study.{out_fmt}' for _, out_fmt in chain[:-1]}
+    if data_files(data_dir) != expected:
+        return f'data/ holds {sorted(data_files(data_dir))}, expected {sorted(expected)}'
+
+    if output_format != 'db':
+        output = output_path.read_bytes()
+        if reference.setdefault(output_format, output) != output:
+            return 'output differs from the first run'
+    return None
+
+
+if __name__ == '__main__':
+    reference = {}
+    runs = 0
+    try:
+        for output_format, stream, cached, keep in product(TARGETS, (False, True), (False, True), (False, True)):
+            with tempfile.TemporaryDirectory() as tmp:
+                error = check(output_format, stream, cached, keep, tmp, reference)
+            if error:
+                print(f'planner  FAILED on txt -> {output_format} (stream={stream}, cache={cached}, '
+                      f'keep_intermediates={keep}): {error}')
+                sys.exit(1)
+            runs += 1
+    finally:
+        codec.set_streaming(False)
+    print(f'planner  ok   {runs} chains')
@@ -0,0 +1,91 @@
+"""check_txt_yml.py
+
+Check that txt_yml's streaming conversion writes the same YAML as the
+in-memory one, on known regressions and on random outlines with repeated
+titles, text, bullets and numbered items:
+
+- stream_markdown_to_yaml either writes exactly what markdown_to_yaml
+  does or raises RepeatedHeaderError
+- convert(stream=True) always writes what convert(stream=False) does,
+  falling back to the in-memory conversion on RepeatedHeaderError
+
+Outlines the in-memory parser itself fails on are skipped. Exits non-zero
+on the first mismatch.
+
+Usage:
+    python bench/check_txt_yml.py --trials 2000
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import txt_yml  # noqa: E402
+
+REGRESSIONS = [
+    # a sub-header titled like its parent, whose text is key A of section A
+    '# A\ntext\n## A\n',
+    '# A\ntext\n## B\n# A\nmore\n',
+    '# A\n- x\n- y\n## A\n',
+]
+
+TITLES = ['A', 'B', 'C', 'yes', '1', 'a: b']
+TEXTS = ['text', 'more text', '- item', '* item', '1. first', '', 'key: value', '  indented']
+
+
+def random_outline(rng):
+    lines = []
+    for _ in range(rng.randint(1, 30)):
+        if not lines or rng.random() < 0.4:
+            lines.append('#' * rng.randint(1, 4) + ' ' + rng.choice(TITLES))
+        else:
+            lines.append(rng.choice(TEXTS))
+    return '\n'.join(lines) + '\n'
+
+
+def check(text, tmp):
+    try:
+        expected = txt_yml.markdown_to_yaml(io.StringIO(text))
+    except (AttributeError, TypeError):
+        # the in-memory parser cannot handle it either
+        return None
+    out = io.StringIO()
+    try:
+        txt_yml.stream_markdown_to_yaml(io.StringIO(text), out)
+    except txt_yml.RepeatedHeaderError:
+        pass
+    else:
+        if out.getvalue() != expected:
+            return f'stream_markdown_to_yaml wrote {out.getvalue()!r}, expected {expected!r}'
+
+    src, dst = Path(tmp) / 'in.txt', Path(tmp) / 'out.yml'
+    src.write_text(text, encoding='utf-8')
+    with contextlib.redirect_stdout(io.StringIO()):
+        txt_yml.convert('in', str(src), str(dst), stream=True)
+    written = dst.read_text(encoding='utf-8')
+    if written != expected:
+        return f'convert(stream=True) wrote {written!r}, expected {expected!r}'
+    return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check streaming txt_yml output against the in-memory output')
+    parser.add_argument('--trials', type=int, default=2000, help='random outlines')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        outlines = REGRESSIONS + [random_outline(rng) for _ in range(args.trials)]
+        for text in outlines:
+            error = check(text, tmp)
+            if error:
+                print(f'txt_yml  FAILED on {text!r} (--seed {args.seed}): {error}')
+                sys.exit(1)
+    print(f'txt_yml  ok   {len(REGRESSIONS)} regressions, {args.trials} random outlines')
@@ -0,0 +1,156 @@
+"""check_xlsx.py
+
+Check src/xlsx_csv.py's workbook reader against openpyxl on random
+workbooks written by openpyxl: text (with line breaks, quotes, _xHHHH_
+lookalikes and rich-text runs), integers, floats, booleans, dates,
+datetimes and times, blank cells and rows, on several sheets.
+
+Each cell must read as openpyxl's value written the way xlsx_csv writes
+it: '' for blanks, TRUE/FALSE, ISO dates and times, and numbers that
+parse back to the same value. openpyxl writes text that looks like an
+_xHHHH_ escape as is and reads it back as is, where Excel (and xlsx_csv)
+decode it, so such text is expected decoded. Exits non-zero on the first
+mismatch. Needs openpyxl (for this check only).
+
+Usage:
+    python bench/check_xlsx.py --trials 20
+"""
+
+import argparse
+import random
+import re
+import sys
+import tempfile
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+try:
+    import openpyxl
+    from openpyxl.cell.rich_text import CellRichText, TextBlock
+    from openpyxl.cell.text import InlineFont
+except ImportError:
+    sys.exit('check_xlsx.py needs openpyxl 3.1 or later: pip install openpyxl')
+
+from src.xlsx_csv import iter_rows, sheet_names  # noqa: E402
+
+TEXTS = ['alpha', 'béta', 'line\nbreak', 'cr\r\nlf', '  spaced ', '_x0041_lit', '"q", r', 'a < b & c', '0012']
+
+# column kind -> number format set on its cells (None: openpyxl's default)
+FORMATS = {'text': None, 'rich': None, 'int': None, 'float': None, 'bool': None,
+           'date': 'yyyy-mm-dd', 'datetime': 'yyyy-mm-dd hh:mm:ss', 'time': 'h:mm:ss'}
+
+
+def random_value(rng, kind):
+    if rng.random() < 0.15:
+        return None
+    if kind == 'text':
+        return rng.choice(TEXTS)
+    if kind == 'rich':
+        return CellRichText(rng.choice(TEXTS[:3]), TextBlock(InlineFont(b=True), rng.choice(TEXTS)))
+    if kind == 'int':
+        return rng.randint(-10**12, 10**12)
+    if kind == 'float':
+        return rng.uniform(-1e6, 1e6) * rng.choice([1, 1e-9, 1e9])
+    if kind == 'bool':
+        return rng.random() < 0.5
+    if kind == 'date':
+        return date(1900, 3, 1) + timedelta(days=rng.randint(0, 70000))
+    if kind == 'datetime':
+        return datetime(2020, 5, 17, rng.randint(0, 23), rng.randint(0, 59), rng.randint(0, 59))
+    return time(rng.randint(0, 23), rng.randint(0, 59), rng.randint(0, 59))
+
+
+def write_workbook(rng, path):
+    """Write a random workbook to path; return each sheet's name and column kinds."""
+    wb = openpyxl.Workbook()
+    sheets = {}
+    for s in range(rng.randint(1, 3)):
+        ws = wb.active if s == 0 else wb.create_sheet()
+        ws.title = f'Sheet {s} & co'
+        kinds = [rng.choice(list(FORMATS)) for _ in range(rng.randint(1, 10))]
+        ws.append(kinds)
+        for r in range(2, rng.randint(2, 300)):
+            if rng.random() < 0.05:
+                # a row with no values, skipped by the reader
+                continue
+            for c, kind in enumerate(kinds, 1):
+                value = random_value(rng, kind)
+                if value is not None:
+                    cell = ws.cell(row=r, column=c, value=value)
+                    if FORMATS[kind]:
+                        cell.number_format = FORMATS[kind]
+        sheets[ws.title] = kinds
+    wb.save(path)
+    return sheets
+
+
+def expected(value, kind):
+    """openpyxl's value of a cell, written as xlsx_csv writes it."""
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return re.sub('_x([0-9A-Fa-f]{4})_', lambda m: chr(int(m.group(1), 16)), value)
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if kind == 'date':
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, time):
+        return value.strftime('%H:%M:%S')
+    return str(value)
+
+
+def same(mine, ref, kind):
+    if kind in ('int', 'float') and isinstance(ref, (int, float)) and not isinstance(ref, bool):
+        return mine != '' and float(mine) == ref
+    return mine == expected(ref, kind)
+
+
+def check_workbook(rng, path):
+    sheets = write_workbook(rng, path)
+    if sheet_names(path) != list(sheets):
+        return f'sheet names {sheet_names(path)} != {list(sheets)}'
+    book = openpyxl.load_workbook(path, read_only=True, rich_text=False)
+    try:
+        return _compare_sheets(rng, path, book, sheets)
+    finally:
+        book.close()
+
+
+def _compare_sheets(rng, path, book, sheets):
+    first = next(iter(sheets))
+    for name, kinds in sheets.items():
+        ref_rows = [row for row in book[name].iter_rows(values_only=True) if any(v is not None for v in row)]
+        # the first sheet is also read as the default one
+        sheet = None if name == first and rng.random() < 0.5 else name
+        rows = list(iter_rows(path, sheet))
+        if len(rows) != len(ref_rows):
+            return f'{name}: {len(rows)} rows != {len(ref_rows)}'
+        for r, (row, ref) in enumerate(zip(rows, ref_rows), 1):
+            if len(row) > len(ref):
+                return f'{name} row {r}: {len(row)} cells != {len(ref)}'
+            row = row + [''] * (len(ref) - len(row))
+            for c, (mine, value) in enumerate(zip(row, ref)):
+                kind = kinds[c] if r > 1 else 'text'
+                if not same(mine, value, kind):
+                    return f'{name} row {r} column {c + 1} ({kind}): {mine!r} != {value!r}'
+    return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the xlsx reader against openpyxl')
+    parser.add_argument('--trials', type=int, default=20, help='random workbooks')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        for trial in range(args.trials):
+            error = check_workbook(rng, str(Path(tmp) / f'{trial}.xlsx'))
+            if error:
+                print(f'xlsx     FAILED on trial {trial} (--seed {args.seed}): {error}')
+                sys.exit(1)
+    print(f'xlsx     ok   {args.trials} random workbooks')
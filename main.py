@@ -1,19 +1,29 @@
+import argparse
+import glob
 import sys
+import time
+from contextlib import nullcontext
 from pathlib import Path
 import src
 import os
+from src import codec, instrument
+from src.cache import DEFAULT_MAX_BYTES, ConversionCache
 
-def main():
+DATA_DIR = Path('./data/')
+CACHE_DIR = DATA_DIR / '.cache'
+
+
+def interactive():
     input_format = input('Enter input file format: ').strip().lower()
     output_format = input('Enter output file format: ').strip().lower()
     file_name = input('Enter file name (without extension): ').strip()
-    data_dir = Path('./data/')
+    data_dir = DATA_DIR
     input_file = data_dir / input_format / f'{file_name}.{input_format}'
     output_file = data_dir / output_format / f'{file_name}.{output_format}'
     os.makedirs(output_file.parent, exist_ok=True)
 
     try:
-        convert_func = src.get_converter(input_format, output_format)
+        convert_func = src.get_converter(input_format, output_format, cache=ConversionCache(CACHE_DIR))
     except (ImportError, AttributeError) as e:
         print(f'Error: No conversion function found for {input_format} to {output_format}: {e}')
         sys.exit(1)
@@ -22,5 +32,175 @@ def main():
     # converters follow signature: convert(file_name, input_path, output_path)
     convert_func(file_name, str(input_file), str(output_file))
 
+
+def expand_inputs(input_format, patterns):
+    """Resolve files, directories and glob patterns to a sorted list of input files.
+
+    Directories contribute their *.<input_format> files; with no patterns the
+    default is data/<input_format>/.
+    """
+    files = set()
+    for pattern in patterns or [str(DATA_DIR / input_format)]:
+        path = Path(pattern)
+        if path.is_dir():
+            files.update(path.glob(f'*.{input_format}'))
+        elif path.is_file():
+            files.add(path)
+        else:
+            files.update(Path(p) for p in glob.glob(pattern, recursive=True) if Path(p).is_file())
+    return sorted(files)
+
+
+def convert_file(input_format, output_format, input_file, output_file, keep_intermediates=False, cache_bytes=None,
+                 profile=None):
+    """Run one conversion; return (input_file, seconds, error or None, profile events).
+
+    Errors are returned rather than raised so one bad file cannot stop a batch.
+    cache_bytes sizes the conversion cache; None disables it. profile is
+    None, 'time' or 'memory' (also trace allocations per stage).
+    """
+    start = time.perf_counter()
+    profiler = instrument.Profiler(memory=profile == 'memory', file=str(input_file)) if profile else None
+    with instrument.profiling(profiler) if profiler else nullcontext():
+        try:
+            with instrument.stage('convert', conversion=f'{input_format}_{output_format}'):
+                cache = ConversionCache(CACHE_DIR, cache_bytes) if cache_bytes is not None else None
+                convert_func = src.get_converter(input_format, output_format, keep_intermediates, cache)
+                os.makedirs(Path(output_file).parent, exist_ok=True)
+                convert_func(Path(input_file).stem, str(input_file), str(output_file))
+            error = None
+        except Exception:
+            import traceback
+            error = traceback.format_exc(limit=-3).strip()
+    return str(input_file), time.perf_counter() - start, error, profiler.events if profiler else None
+
+
+def run_batch(input_format, output_format, patterns, workers=None, out_dir=None, keep_intermediates=False,
+              cache_bytes=DEFAULT_MAX_BYTES, profile=None, profile_path=None, profile_format='json'):
+    """Convert every matching input file, fanning out across a process pool.
+
+    With profile ('time' or 'memory'), the stages of every conversion are
+    written to profile_path as a profile_format trace. Returns the number
+    of failed files.
+    """
+    inputs = expand_inputs(input_format, patterns)
+    if not inputs:
+        print(f'No .{input_format} files found')
+        return 0
+    out_dir = Path(out_dir) if out_dir else DATA_DIR / output_format
+    jobs = [(input_format, output_format, str(p), str(out_dir / f'{p.stem}.{output_format}'), keep_intermediates,
+             cache_bytes, profile)
+            for p in inputs]
+
+    start = time.perf_counter()
+    results = []
+    if workers == 1:
+        # in-process, e.g. for debugging a converter
+        for job in jobs:
+            results.append(convert_file(*job))
+            _report(results[-1])
+    else:
+        # multiprocessing is slow to import; only batch runs need it
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(convert_file, *job) for job in jobs]
+            for future in as_completed(futures):
+                results.append(future.result())
+                _report(results[-1])
+
+    failed = [r for r in results if r[2]]
+    print(f'{len(results) - len(failed)}/{len(results)} converted in {time.perf_counter() - start:.2f}s, '
+          f'{len(failed)} failed')
+    if profile:
+        instrument.write_trace([e for r in results for e in r[3]], profile_path, profile_format)
+        print(f'Profile written to {profile_path}')
+    return len(failed)
+
+
+def _init_worker():
+    # workers cannot prompt; converters that call input() fail with EOFError
+    sys.stdin = open(os.devnull)
+
+
+def _report(result):
+    input_file, elapsed, error, _ = result
+    status = 'ok' if error is None else 'FAILED'
+    print(f'{status:>6} {elapsed:8.3f}s  {input_file}')
+    if error:
+        print('       ' + error.replace('\n', '\n       '))
+
+
+def _positive_int(text):
+    """argparse type for counts that must be at least 1."""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid int value: {text!r}')
+    if value < 1:
+        raise argparse.ArgumentTypeError(f'must be at least 1, not {value}')
+    return value
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        interactive()
+        return
+
+    parser = argparse.ArgumentParser(description='Convert files between dandoc formats')
+    parser.add_argument('input_format', help='input file format, e.g. txt')
+    parser.add_argument('output_format', help='output file format, e.g. yml')
+    parser.add_argument('inputs', nargs='*',
+                        help='files, directories or glob patterns (default: data/<input_format>/)')
+    parser.add_argument('--workers', type=_positive_int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--out-dir', default=None, help='output directory (default: data/<output_format>/)')
+    parser.add_argument('--keep-intermediates', action='store_true',
+                        help='write the intermediate files of multi-step conversions')
+    parser.add_argument('--no-cache', action='store_true', help='always reconvert, ignoring data/.cache/')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // 2**20,
+                        help='conversion cache size limit in MB (default: %(default)s)')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running and reconvert files in the input directories when they are saved')
+    parser.add_argument('--debounce', type=float, default=0.2,
+                        help='with --watch, seconds without changes before converting (default: %(default)s)')
+    parser.add_argument('--profile', metavar='PATH', default=None,
+                        help='write per-stage timings, counters and memory of each conversion to PATH')
+    parser.add_argument('--profile-format', choices=instrument.TRACE_FORMATS, default='json',
+                        help='trace format: json, or chrome for chrome://tracing / Perfetto (default: %(default)s)')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='with --profile, also trace allocations per stage (slow)')
+    parser.add_argument('--codec', choices=codec.MODES, default=None,
+                        help='YAML/JSON writing: fast (libyaml/orjson when installed), exact (byte-identical '
+                             'pure-Python output) or compact JSON (default: $DANDOC_CODEC, else fast)')
+    parser.add_argument('--stream', action='store_true',
+                        help='convert outlines (txt -> yml, yml -> txt) while reading them instead of loading '
+                             'them whole, for files too large for memory (default: $DANDOC_STREAM)')
+    # options may come before, between or after the input patterns
+    args = parser.parse_intermixed_args(argv)
+
+    if args.codec:
+        codec.set_mode(args.codec)
+    if args.stream:
+        codec.set_streaming(True)
+    cache_bytes = None if args.no_cache else args.cache_size * 2**20
+    if args.watch:
+        from src.watch import watch
+        input_format, output_format = args.input_format.lower(), args.output_format.lower()
+        dirs = [Path(p) for p in args.inputs] or [DATA_DIR / input_format]
+        for d in dirs:
+            if not d.is_dir():
+                parser.error(f'--watch needs input directories, not {d}')
+        cache = ConversionCache(CACHE_DIR, cache_bytes) if cache_bytes is not None else None
+        out_dir = Path(args.out_dir) if args.out_dir else DATA_DIR / output_format
+        watch(input_format, output_format, dirs, out_dir, args.debounce, args.keep_intermediates, cache)
+        return
+
+    profile = ('memory' if args.profile_memory else 'time') if args.profile else None
+    failures = run_batch(args.input_format.lower(), args.output_format.lower(), args.inputs,
+                         args.workers, args.out_dir, args.keep_intermediates, cache_bytes,
+                         profile, args.profile, args.profile_format)
+    sys.exit(1 if failures else 0)
+
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
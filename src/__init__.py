@@ -3,23 +3,44 @@
 Avoid importing converter modules at package import time because some
 modules may perform interactive prompts or side-effects when imported.
 
-Provide a small helper to lazily load a converter by name.
+Provide a small helper to lazily load a converter by name. Format pairs
+without a direct converter module are served by chaining converters (see
+planner.py).
 """
 from importlib import import_module
 from types import ModuleType
 from typing import Callable
 
 
-def get_converter(input_fmt: str, output_fmt: str) -> Callable[[str, str, str], None]:
+def get_converter(input_fmt: str, output_fmt: str, keep_intermediates: bool = False,
+		cache=None) -> Callable[[str, str, str], None]:
 	"""Return the convert(file_name, input_path, output_path) callable for the
 	given input/output formats.
 
-	Raises ImportError or AttributeError if the module or function is missing.
+	If there is no direct converter, the shortest chain of converters is
+	used instead; keep_intermediates makes it write each intermediate file.
+	With a cache.ConversionCache, conversions of unchanged inputs are skipped
+	(see planner.run_chain).
+
+	Raises ImportError or AttributeError if the module or function is missing
+	and no chain connects the formats.
 	"""
 	module_name = f"src.{input_fmt}_{output_fmt}"
-	mod: ModuleType = import_module(module_name)
-	# converters should expose a function named `convert`
-	return getattr(mod, "convert")
+	try:
+		mod: ModuleType = import_module(module_name)
+		# converters should expose a function named `convert`
+		convert = getattr(mod, "convert")
+		if cache is None:
+			return convert
+		chain = [(input_fmt, output_fmt)]
+	except (ImportError, AttributeError) as direct_error:
+		from .planner import plan
+		try:
+			chain = plan(input_fmt, output_fmt)
+		except ImportError:
+			raise direct_error
+	from .planner import chain_converter
+	return chain_converter(chain, keep_intermediates, cache)
 
 
 __all__ = ["get_converter"]
\ No newline at end of file
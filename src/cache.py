@@ -0,0 +1,167 @@
+"""cache.py
+
+Content-addressed cache for conversions, stored under data/.cache/.
+
+Entries are keyed on a hash of the input file's content, the identity of
+every converter stage involved (module name plus a hash of the source of
+the whole src package, so editing a converter or any helper it uses
+invalidates its entries) and the conversion options.
+Two kinds of entries are kept:
+
+- <key>.out: a copy of a finished output file, so an unchanged input can
+  skip the conversion entirely
+- <key>.data: the pickled in-memory result of a chaining stage (the parsed
+  outline dict, a TableBuilder, ...), so a different conversion of the same
+  input can start from it instead of re-parsing
+
+Only stages that implement the chaining hooks are cached (see planner.py);
+converters that talk to a database always run. The cache is trimmed to
+max_bytes by evicting the least recently used entries.
+"""
+
+import hashlib
+import os
+import pickle
+from contextlib import suppress
+from functools import lru_cache
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+MISS = object()
+
+
+def hash_file(path) -> str:
+    """sha256 hex digest of the file at path."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _package_hash(package_dir: str) -> str:
+    h = hashlib.sha256()
+    for path in sorted(Path(package_dir).rglob('*.py')):
+        h.update(path.relative_to(package_dir).as_posix().encode('utf-8'))
+        h.update(hash_file(path).encode('ascii'))
+    return h.hexdigest()
+
+
+def stage_identity(mod: ModuleType) -> str:
+    """Identify a converter module by name and the source of its package.
+
+    Converters share helpers (json_sql's TableBuilder, codec, dbpool, ...)
+    that are hard to trace through lazy imports, so the whole package is
+    hashed: any source edit invalidates the cache.
+    """
+    return f'{mod.__name__}:{_package_hash(str(Path(mod.__file__).parent))}'
+
+
+class ConversionCache:
+    def __init__(self, root, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        """Combine input hash, stage identities and options into one key."""
+        return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+    def _path(self, key: str, kind: str) -> Path:
+        return self.root / f'{key}.{kind}'
+
+    def _touch(self, path: Path) -> bool:
+        # mtime doubles as the last-used time for LRU eviction
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _store(self, path: Path, write) -> None:
+        """Write an entry atomically, so concurrent workers never see half of one."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        # one writer per process, so the pid makes the name unique
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        try:
+            with open(tmp, 'wb') as f:
+                write(f)
+            os.replace(tmp, path)
+        except BaseException:
+            # the temp file may never have been created; keep the original error
+            with suppress(OSError):
+                tmp.unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def get_data(self, key: str) -> Any:
+        """Return the cached stage data for key, or MISS."""
+        path = self._path(key, 'data')
+        if not self._touch(path):
+            return MISS
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return MISS
+
+    def put_data(self, key: str, data: Any) -> None:
+        self._store(self._path(key, 'data'), lambda f: pickle.dump(data, f, pickle.HIGHEST_PROTOCOL))
+
+    def restore_output(self, key: str, output_path) -> bool:
+        """Make output_path hold the cached output for key; False on a miss.
+
+        An output file that already matches is left untouched.
+        """
+        # shutil is slow to import and only needed once there is an output
+        import shutil
+        path = self._path(key, 'out')
+        if not self._touch(path):
+            return False
+        output_path = Path(output_path)
+        try:
+            if not (output_path.is_file() and output_path.stat().st_size == path.stat().st_size
+                    and hash_file(output_path) == hash_file(path)):
+                output_path.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(path, output_path)
+        except FileNotFoundError:
+            # evicted by another process in the meantime
+            return False
+        return True
+
+    def put_output(self, key: str, output_path) -> None:
+        import shutil
+
+        def write(f):
+            with open(output_path, 'rb') as src:
+                shutil.copyfileobj(src, f)
+        self._store(self._path(key, 'out'), write)
+
+    def evict(self) -> None:
+        """Delete least recently used entries until the cache fits max_bytes."""
+        entries = []
+        total = 0
+        for path in self.root.glob('*.*'):
+            if path.suffix not in ('.out', '.data'):
+                continue
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+__all__ = ["ConversionCache", "DEFAULT_MAX_BYTES", "MISS", "hash_file", "stage_identity"]
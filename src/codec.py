@@ -0,0 +1,160 @@
+"""codec.py
+
+YAML and JSON reading and writing shared by the converters, through the
+fastest implementation available.
+
+Modes (main.py --codec, or the DANDOC_CODEC environment variable):
+- fast (default): libyaml (PyYAML's CSafeLoader/CSafeDumper) if PyYAML was
+  built with it, and orjson for JSON if it is installed; the pure-Python
+  implementations otherwise
+- exact: the pure-Python implementations, which write byte for byte what
+  the converters always have
+- compact: as fast, but JSON is written without indentation (through
+  orjson, or the C encoder of the json module)
+
+txt -> yml and yml -> txt can also stream (main.py --stream, or
+DANDOC_STREAM=1): the outline or YAML is converted as it is read instead
+of being held in memory whole; see streaming().
+
+Files written in fast mode load back to the same data as in exact mode,
+but the bytes can differ:
+- libyaml breaks long double-quoted strings at other points and writes an
+  empty key as '' rather than ? ''
+- orjson writes non-ASCII characters as UTF-8 rather than \\u escapes and
+  floats in shortest form (1e16 rather than 1e+16)
+
+Data orjson cannot write as json does (non-string keys, integers beyond
+64 bits, dates, and NaN or Infinity, which it would write as null) is
+written by the json module instead. Both packages are imported on first
+use, so importing this module costs nothing.
+"""
+
+import os
+from functools import lru_cache
+
+MODES = ('fast', 'exact', 'compact')
+
+
+def mode() -> str:
+    """The codec mode in effect, from DANDOC_CODEC (default: fast)."""
+    value = os.environ.get('DANDOC_CODEC', 'fast')
+    if value not in MODES:
+        raise ValueError(f"Unknown codec mode '{value}', expected one of {', '.join(MODES)}")
+    return value
+
+
+def set_mode(value: str) -> None:
+    """Switch the codec mode, for this process and the ones it starts."""
+    if value not in MODES:
+        raise ValueError(f"Unknown codec mode '{value}', expected one of {', '.join(MODES)}")
+    # batch workers inherit the environment
+    os.environ['DANDOC_CODEC'] = value
+
+
+def streaming() -> bool:
+    """Whether outlines are converted as streams (main.py --stream, or DANDOC_STREAM=1)."""
+    return os.environ.get('DANDOC_STREAM', '') not in ('', '0')
+
+
+def set_streaming(value: bool) -> None:
+    """Switch streaming of outline conversions, for this process and the ones it starts."""
+    os.environ['DANDOC_STREAM'] = '1' if value else '0'
+
+
+def _fast_yaml() -> bool:
+    import yaml
+    return mode() != 'exact' and yaml.__with_libyaml__
+
+
+@lru_cache(maxsize=None)
+def _orjson():
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def _has_non_finite(data) -> bool:
+    """Whether data holds a NaN or infinite float anywhere."""
+    import math
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+@lru_cache(maxsize=None)
+def _event_loader(fast: bool):
+    import yaml
+    if not fast:
+        return yaml.SafeLoader
+
+    # CSafeLoader builds nodes in C and cannot compose one value at a time
+    # from the middle of the event stream; the pure-Python composer can.
+    class CSafeEventLoader(yaml.cyaml.CParser, yaml.composer.Composer, yaml.constructor.SafeConstructor,
+                           yaml.resolver.Resolver):
+        def __init__(self, stream):
+            yaml.cyaml.CParser.__init__(self, stream)
+            yaml.composer.Composer.__init__(self)
+            yaml.constructor.SafeConstructor.__init__(self)
+            yaml.resolver.Resolver.__init__(self)
+
+    return CSafeEventLoader
+
+
+def yaml_load(stream):
+    """yaml.safe_load(stream), parsed by libyaml in fast mode."""
+    import yaml
+    return yaml.load(stream, Loader=yaml.CSafeLoader if _fast_yaml() else yaml.SafeLoader)
+
+
+def yaml_event_loader(stream):
+    """A safe loader for reading stream event by event: get_event/check_event, compose_node, construct_document."""
+    return _event_loader(_fast_yaml())(stream)
+
+
+def yaml_dump(data, stream=None):
+    """Dump data as block-style YAML in key order, as txt_yml writes outlines; returns a str without stream."""
+    import yaml
+    return yaml.dump(data, stream, Dumper=yaml.CSafeDumper if _fast_yaml() else yaml.Dumper,
+                     default_flow_style=False, allow_unicode=True, sort_keys=False)
+
+
+def yaml_emit(events, stream) -> None:
+    """Write YAML serialization events to stream."""
+    import yaml
+    yaml.emit(events, stream, Dumper=yaml.CSafeDumper if _fast_yaml() else yaml.Dumper, allow_unicode=True)
+
+
+def json_dump(data, f) -> None:
+    """Write data as JSON to the text file f: indented by 2 like json.dump(data, f, indent=2), or compact."""
+    import json
+    current = mode()
+    orjson = _orjson() if current != 'exact' else None
+    if orjson is not None:
+        option = orjson.OPT_PASSTHROUGH_DATETIME | (orjson.OPT_INDENT_2 if current == 'fast' else 0)
+        try:
+            text = orjson.dumps(data, option=option)
+        except TypeError:
+            # left to json, which writes or rejects it as it always has
+            text = None
+        # orjson writes NaN and Infinity as null; only look for them if there is one
+        if text is not None and not (b'null' in text and _has_non_finite(data)):
+            f.write(text.decode('utf-8'))
+            return
+    if current == 'compact':
+        # dumps, unlike dump, encodes in C (when not indenting)
+        f.write(json.dumps(data, separators=(',', ':')))
+    else:
+        json.dump(data, f, indent=2)
+
+
+__all__ = ["MODES", "mode", "set_mode", "streaming", "set_streaming", "yaml_load", "yaml_event_loader", "yaml_dump", "yaml_emit", "json_dump"]
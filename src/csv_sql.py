@@ -1,54 +1,129 @@
-import psycopg2
-import pandas as pd
+"""csv_sql.py
+
+Import a CSV into a database table (named file_name) and export the same
+rows as an SQL dump.
+
+The CSV is read in chunks. Each chunk is bulk-loaded (COPY FROM STDIN on
+Postgres, executemany on the SQLite stand-in backend) and appended to the
+dump in the same pass, so memory is bounded by the chunk size rather than
+the size of the file. Empty cells are loaded as NULL.
+
+Reading and dumping run in a background thread, pipeline_depth chunks
+ahead of the database load (see pipeline.py). Connections come from the
+configured pool, or are prompted for (see dbpool.py).
+"""
+
+import csv
+import io
+from itertools import islice
 from pathlib import Path
 
-def convert(file_name, input_file, output_file):
-    """
-    Import a CSV into PostgreSQL table (named file_name) and export as SQL dump.
-    """
-    # Ensure output folder exists
-    output_file = Path(output_file)
-    output_file.parent.mkdir(parents=True, exist_ok=True)
+from . import instrument
+from .dbpool import BACKENDS, connection, default_backend
+from .pipeline import prefetch
 
-    # Prompt for database credentials
-    database = input("Database name: ").strip()
-    user = input("User (default postgres): ").strip() or 'postgres'
-    password = input("Password: ").strip()
-    host = input("Host (default localhost): ").strip() or 'localhost'
-    port = input("Port (default 5432): ").strip() or 5432
-
-    # Read CSV
-    df = pd.read_csv(input_file)
-    table = file_name
-    cols = df.columns.tolist()
-
-    # Connect to PostgreSQL
-    conn = psycopg2.connect(
-        database=database,
-        user=user,
-        password=password,
-        host=host,
-        port=port
+
+def _sql_literal(v):
+    if v is None:
+        return 'NULL'
+    s = str(v).replace("'", "''")
+    return f"'{s}'"
+
+
+def _copy_rows(cursor, table, cols, rows):
+    """Bulk-load rows into table with COPY FROM STDIN (CSV format)."""
+    buf = io.StringIO()
+    # None is written as an unquoted empty field, which COPY reads as NULL
+    csv.writer(buf, lineterminator='\n').writerows(rows)
+    buf.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(cols)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def table_rows(rows, width):
+    """Skip blank rows, pad or cut ragged rows to width and turn empty cells into None."""
+    return (
+        [v if v != '' else None for v in row[:width]] + [None] * (width - len(row))
+        for row in rows if row
     )
-    cursor = conn.cursor()
 
+
+def load_rows(conn, cols, rows, table, dump, backend='postgres', chunk_size=10000, pipeline_depth=2):
+    """Create table with cols on conn, bulk-load rows and write them to the dump file object.
+
+    rows yields one list of len(cols) values (None for NULL) per row, e.g.
+    from table_rows. Chunk N+1 is read and dumped while chunk N is loaded;
+    pipeline_depth=0 does one after the other. Returns the number of rows
+    loaded.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+    total = 0
+    cursor = conn.cursor()
     # Create table dynamically
     create_sql = f"CREATE TABLE IF NOT EXISTS {table} ({', '.join([f'{c} TEXT' for c in cols])});"
     cursor.execute(create_sql)
 
-    # Insert CSV rows
-    for row in df.itertuples(index=False):
-        values = ', '.join([f"'{str(v).replace('\'','\'\'')}'" for v in row])
-        cursor.execute(f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({values});")
+    insert_prefix = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ("
+    marks = ', '.join(['?'] * len(cols))
 
-    conn.commit()
+    def read_chunks():
+        while True:
+            with instrument.stage('csv_sql.read'):
+                chunk = list(islice(rows, chunk_size))
+                instrument.count('rows', len(chunk))
+            if not chunk:
+                return
+            # dump the chunk while it is in memory
+            with instrument.stage('csv_sql.dump'):
+                dump.writelines(insert_prefix + ', '.join(map(_sql_literal, row)) + ');\n' for row in chunk)
+            yield chunk
 
-    # Export table to SQL file
-    with open(output_file, 'w') as f:
-        for row in df.itertuples(index=False):
-            vals = ', '.join([f"'{str(v).replace('\'','\'\'')}'" if v is not None else 'NULL' for v in row])
-            f.write(f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({vals});\n")
+    # the connection stays on this thread
+    with prefetch(read_chunks(), pipeline_depth) as chunks:
+        for chunk in chunks:
+            with instrument.stage('csv_sql.db_load', backend=backend):
+                if backend == 'postgres':
+                    _copy_rows(cursor, table, cols, chunk)
+                else:
+                    cursor.executemany(f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({marks})", chunk)
+            total += len(chunk)
 
+    with instrument.stage('csv_sql.commit'):
+        conn.commit()
     cursor.close()
-    conn.close()
-    print(f"CSV {input_file} imported into {table} and SQL dump written to {output_file}")
+    return total
+
+
+def load_csv(conn, input_file, table, output_file, backend='postgres', chunk_size=10000, pipeline_depth=2):
+    """Load input_file into table on conn and write the SQL dump to output_file.
+
+    Returns the number of rows loaded (see load_rows).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+    with open(input_file, 'r', newline='', encoding='utf-8-sig') as f, \
+            open(output_file, 'w', encoding='utf-8') as dump:
+        reader = csv.reader(f)
+        cols = next(reader, [])
+        return load_rows(conn, cols, table_rows(reader, len(cols)), table, dump, backend, chunk_size,
+                         pipeline_depth)
+
+
+def convert(file_name, input_file, output_file, backend=None, chunk_size=10000, conn=None, pipeline_depth=2):
+    """
+    Import a CSV into a database table (named file_name) and export as SQL dump.
+
+    conn is an open connection to reuse (and leave open); by default one is
+    borrowed from the configured pool, or opened from prompted credentials
+    and closed afterwards. backend defaults to the configured one.
+    """
+    # Ensure output folder exists
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+
+    backend = backend or default_backend()
+    with connection(backend, conn) as conn:
+        load_csv(conn, input_file, file_name, output_file, backend, chunk_size, pipeline_depth)
+    print(f"CSV {input_file} imported into {file_name} and SQL dump written to {output_file}")
@@ -0,0 +1,232 @@
+"""dbpool.py
+
+Database connections shared by the database converters (csv_sql, sql_csv,
+xlsx_sql).
+
+Connection settings are read once per process, from a config file or from
+environment variables, instead of being prompted for on every conversion.
+Connections are then kept in a pool and lent to one conversion at a time,
+so a batch of files reuses a few connections.
+
+Settings ([database] section of the config file; a DANDOC_DB_<KEY>
+environment variable overrides <key>):
+- backend: postgres (default) or sqlite
+- database: database name, or the database file for sqlite
+- user, password, host, port: postgres connection details
+- pool_size: the most connections kept open (default 4)
+
+The config file is DANDOC_DB_CONFIG, or dandoc.ini in the working directory
+if it exists. Without a database setting nothing is pooled and the
+converters prompt for connection details as before.
+
+Behavior:
+- Connections are opened on first use, up to pool_size at once; a caller
+  waits while all of them are lent out
+- A connection whose conversion failed is rolled back before it is reused,
+  and dropped if that fails too
+"""
+
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+BACKENDS = ('postgres', 'sqlite')
+ENV_PREFIX = 'DANDOC_DB_'
+DEFAULT_CONFIG = 'dandoc.ini'
+DEFAULT_POOL_SIZE = 4
+SETTINGS = ('backend', 'database', 'user', 'password', 'host', 'port', 'pool_size')
+
+_settings: Optional[Dict[str, str]] = None
+_pools: Dict[str, 'ConnectionPool'] = {}
+_pools_lock = threading.Lock()
+
+
+def connect(backend='postgres'):
+    """Prompt for connection details and open a connection to backend."""
+    if backend == 'sqlite':
+        import sqlite3
+        database = input("SQLite database file: ").strip()
+        return sqlite3.connect(database)
+
+    import psycopg2
+
+    # Prompt for database credentials
+    database = input("Database name: ").strip()
+    user = input("User (default postgres): ").strip() or 'postgres'
+    password = input("Password: ").strip()
+    host = input("Host (default localhost): ").strip() or 'localhost'
+    port = input("Port (default 5432): ").strip() or 5432
+
+    return psycopg2.connect(
+        database=database,
+        user=user,
+        password=password,
+        host=host,
+        port=port
+    )
+
+
+def load_settings(path: str = None) -> Dict[str, str]:
+    """Read the connection settings from the config file at path and the environment."""
+    path = path or os.environ.get(ENV_PREFIX + 'CONFIG') or DEFAULT_CONFIG
+    settings = {}
+    if os.path.isfile(path):
+        import configparser
+        parser = configparser.ConfigParser()
+        parser.read(path, encoding='utf-8')
+        if parser.has_section('database'):
+            settings.update((k, v) for k, v in parser.items('database') if k in SETTINGS)
+    for key in SETTINGS:
+        value = os.environ.get(ENV_PREFIX + key.upper())
+        if value is not None:
+            settings[key] = value
+    backend = settings.get('backend', 'postgres')
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    return settings
+
+
+def settings() -> Dict[str, str]:
+    """The settings of this process, read on first use."""
+    global _settings
+    if _settings is None:
+        _settings = load_settings()
+    return _settings
+
+
+def default_backend() -> str:
+    return settings().get('backend', 'postgres')
+
+
+def open_connection(backend: str, config: Dict[str, str]):
+    """Open a connection to backend from settings, without prompting."""
+    if backend == 'sqlite':
+        import sqlite3
+        # pooled connections may be lent to a different thread than opened them
+        return sqlite3.connect(config['database'], check_same_thread=False)
+
+    import psycopg2
+    return psycopg2.connect(**{k: config[k] for k in ('database', 'user', 'password', 'host', 'port')
+                               if k in config})
+
+
+class ConnectionPool:
+    """Lend out at most size connections made by factory, reusing returned ones."""
+
+    def __init__(self, factory: Callable[[], object], size: int = DEFAULT_POOL_SIZE):
+        if size < 1:
+            raise ValueError(f'Pool size must be at least 1, got {size}')
+        self.factory = factory
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the block; it is rolled back if the block fails."""
+        if self._closed:
+            raise ValueError('Connection pool is closed')
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self.factory()
+            try:
+                yield conn
+            except BaseException as exc:
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    # broken connection: do not hand it out again, and
+                    # report the block's error rather than the rollback's
+                    _close_quietly(conn)
+                    raise exc from rollback_error
+                self._release(conn)
+                raise
+            self._release(conn)
+        finally:
+            self._slots.release()
+
+    def _release(self, conn):
+        if self._closed:
+            _close_quietly(conn)
+        else:
+            self._idle.put(conn)
+
+    def close(self):
+        """Close the idle connections; connections still lent out are closed on return."""
+        self._closed = True
+        while True:
+            try:
+                _close_quietly(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def get_pool(backend: str = None) -> Optional[ConnectionPool]:
+    """The process's pool for backend, or None if no database is configured."""
+    config = settings()
+    if 'database' not in config:
+        return None
+    backend = backend or default_backend()
+    with _pools_lock:
+        pool = _pools.get(backend)
+        if pool is None:
+            size = int(config.get('pool_size', DEFAULT_POOL_SIZE))
+            pool = _pools[backend] = ConnectionPool(lambda: open_connection(backend, config), size)
+    return pool
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+@contextmanager
+def connection(backend: str, conn=None):
+    """Provide a connection for one conversion.
+
+    conn, if given, is used and left open (rolled back if the block fails).
+    Otherwise one is borrowed from the configured pool, or, with no pool,
+    opened from prompted details and closed afterwards.
+    """
+    if conn is not None:
+        try:
+            yield conn
+        except BaseException as exc:
+            # leave a reused connection usable for the next call
+            try:
+                conn.rollback()
+            except Exception as rollback_error:
+                raise exc from rollback_error
+            raise
+        return
+
+    pool = get_pool(backend)
+    if pool is not None:
+        with pool.connection() as conn:
+            yield conn
+        return
+
+    conn = connect(backend)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+__all__ = ["BACKENDS", "ConnectionPool", "close_pools", "connect", "connection", "default_backend", "get_pool",
+           "load_settings", "open_connection", "settings"]
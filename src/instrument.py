@@ -0,0 +1,189 @@
+"""instrument.py
+
+Per-stage timing, counters and memory for converters.
+
+Converters mark their stages and count what they process through the
+module-level functions, which act on the active Profiler:
+
+    with instrument.stage('parse'):
+        ...
+        instrument.count('rows', n)
+
+When no Profiler is active (the default), stage() returns a shared no-op
+context manager and count() returns at once, so instrumentation costs one
+function call. Count per chunk or per table, not per value.
+
+Behavior:
+- Stages nest (separately in each thread); each records its start,
+  duration, counters and the process's peak RSS so far (None on Windows
+  without psutil)
+- With memory=True, tracemalloc also gives each stage its own peak of
+  traced allocations (much slower; use for memory, not timing)
+- The recorded events are written as a JSON trace or in the Chrome trace
+  event format (chrome://tracing, https://ui.perfetto.dev)
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional
+
+_NULL_STAGE = nullcontext()
+TRACE_FORMATS = ('json', 'chrome')
+
+
+def max_rss_bytes() -> Optional[int]:
+    """Peak RSS of this process so far, or None where it cannot be read."""
+    try:
+        import resource
+    except ImportError:
+        # Windows has no resource module; psutil reports the peak working set
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return getattr(psutil.Process().memory_info(), 'peak_wset', None)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class Profiler:
+    """Record stage events for one process."""
+
+    def __init__(self, memory: bool = False, **labels: Any):
+        self.memory = memory
+        # json and tracemalloc are only imported when profiling
+        self.tracemalloc = None
+        if memory:
+            import tracemalloc
+            self.tracemalloc = tracemalloc
+        # added to the args of every event, e.g. the file being converted
+        self.labels = labels
+        self.events: List[Dict[str, Any]] = []
+        # stages nest per thread (see pipeline.py)
+        self._local = threading.local()
+
+    @property
+    def _stack(self) -> List[Dict[str, Any]]:
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    @contextmanager
+    def stage(self, name: str, **args: Any):
+        stack = self._stack
+        event = {'name': name, 'pid': os.getpid(), 'tid': threading.get_ident(), 'depth': len(stack),
+                 'args': dict(self.labels, **args), 'counters': {}}
+        tracemalloc = self.tracemalloc
+        if self.memory:
+            if stack:
+                # the parent keeps the peak reached before this stage resets it
+                parent = stack[-1]
+                parent['_peak'] = max(parent['_peak'], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            event['_peak'] = 0
+        stack.append(event)
+        event['start_ns'] = time.perf_counter_ns()
+        try:
+            yield event
+        finally:
+            event['duration_ns'] = time.perf_counter_ns() - event['start_ns']
+            stack.pop()
+            event['max_rss_bytes'] = max_rss_bytes()
+            if self.memory:
+                peak = max(event.pop('_peak'), tracemalloc.get_traced_memory()[1])
+                event['peak_traced_bytes'] = peak
+                if stack:
+                    stack[-1]['_peak'] = max(stack[-1]['_peak'], peak)
+            self.events.append(event)
+
+    def count(self, name: str, n: int = 1):
+        """Add n to counter name of the innermost open stage of this thread."""
+        stack = self._stack
+        if stack:
+            counters = stack[-1]['counters']
+            counters[name] = counters.get(name, 0) + n
+
+
+class _NullProfiler:
+    def stage(self, name: str, **args: Any):
+        return _NULL_STAGE
+
+    def count(self, name: str, n: int = 1):
+        pass
+
+
+_NULL = _NullProfiler()
+_active = _NULL
+
+
+def stage(name: str, **args: Any):
+    """Context manager timing a stage of the active profiler (no-op if none)."""
+    return _active.stage(name, **args)
+
+
+def count(name: str, n: int = 1):
+    """Add n to a counter of the current stage (no-op if no profiler is active)."""
+    _active.count(name, n)
+
+
+def enabled() -> bool:
+    return _active is not _NULL
+
+
+@contextmanager
+def profiling(profiler: Profiler):
+    """Make profiler the active one within the block."""
+    global _active
+    previous = _active
+    started = profiler.memory and not profiler.tracemalloc.is_tracing()
+    if started:
+        profiler.tracemalloc.start()
+    _active = profiler
+    try:
+        yield profiler
+    finally:
+        _active = previous
+        if started:
+            profiler.tracemalloc.stop()
+
+
+def write_trace(events: List[Dict[str, Any]], path: str, fmt: str = 'json'):
+    """Write events (from one or more Profilers) to path as a JSON or Chrome trace."""
+    import json
+    if fmt not in TRACE_FORMATS:
+        raise ValueError(f"Unknown trace format '{fmt}', expected one of {', '.join(TRACE_FORMATS)}")
+    # perf_counter shares its clock across processes on Linux; start at 0
+    origin = min((e['start_ns'] for e in events), default=0)
+    events = sorted(events, key=lambda e: (e['start_ns'], e['depth']))
+    if fmt == 'chrome':
+        trace = {'traceEvents': [
+            {
+                'name': e['name'], 'ph': 'X', 'pid': e['pid'], 'tid': e['tid'],
+                'ts': (e['start_ns'] - origin) / 1000, 'dur': e['duration_ns'] / 1000,
+                'args': dict(e['args'], **e['counters'], max_rss_bytes=e['max_rss_bytes'],
+                             **({'peak_traced_bytes': e['peak_traced_bytes']} if 'peak_traced_bytes' in e else {})),
+            }
+            for e in events
+        ], 'displayTimeUnit': 'ms'}
+    else:
+        trace = {'stages': [
+            {
+                'name': e['name'], 'pid': e['pid'], 'tid': e['tid'], 'depth': e['depth'],
+                'start_s': (e['start_ns'] - origin) / 1e9, 'seconds': e['duration_ns'] / 1e9,
+                **e['args'], 'counters': e['counters'], 'max_rss_bytes': e['max_rss_bytes'],
+                **({'peak_traced_bytes': e['peak_traced_bytes']} if 'peak_traced_bytes' in e else {}),
+            }
+            for e in events
+        ]}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(trace, f, indent=1)
+        f.write('\n')
+
+
+__all__ = ["Profiler", "TRACE_FORMATS", "count", "enabled", "max_rss_bytes", "profiling", "stage", "write_trace"]
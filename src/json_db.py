@@ -0,0 +1,131 @@
+"""json_db.py
+
+Load nested JSON straight into an SQLite database file, with the same
+tables json_sql.py would generate but without rendering and re-parsing
+SQL text.
+
+Behavior:
+- The JSON is read into a TableBuilder exactly as json_sql.py does
+- Rows are inserted with parameterized executemany, all in one transaction
+- parent_id columns are declared as foreign keys to the parent table and
+  indexed after the data is loaded, so parent/child joins are fast
+- Output: one SQLite file written to data/db/<base>.db
+
+Values are converted with the same rules json_sql.py uses to render SQL
+literals, so the database matches what loading that SQL would produce.
+
+Run from the repository root as: python -m src.json_db <input.json>
+"""
+
+from pathlib import Path
+import sqlite3
+from typing import Any, Callable, List
+
+from . import instrument
+from .json_sql import TableBuilder, json_file_to_tables, json_to_tables, load, read
+
+
+def _db_converter(ctype: str) -> Callable[[Any], Any]:
+    """Return a function mapping a stored value to its SQLite parameter."""
+    if ctype == 'TEXT':
+        return lambda v: None if v is None else str(v)
+    num = _to_integer if ctype == 'INTEGER' else float
+
+    def convert_value(v):
+        if v is None:
+            return None
+        try:
+            return num(v)
+        except Exception:
+            return str(v)
+    return convert_value
+
+
+def _to_integer(v: Any) -> Any:
+    n = int(v)
+    # SQLite reads integer literals beyond 64 bits as REAL
+    if -(1 << 63) <= n < (1 << 63):
+        return n
+    return float(n)
+
+
+def tables_to_sqlite(tb: TableBuilder, db_path: str) -> List[str]:
+    """Load every table of tb into the SQLite database at db_path."""
+    conn = sqlite3.connect(db_path)
+    try:
+        # bulk load: no rollback journal on disk, no fsync per page
+        conn.execute('PRAGMA journal_mode = MEMORY')
+        conn.execute('PRAGMA synchronous = OFF')
+        with conn, instrument.stage('json_db.load'):
+            for table in tb.tables:
+                cols = tb.columns(table)
+                ctypes = [tb.column_type(table, c) for c in cols]
+
+                parent = tb.parents.get(table)
+                parent_def = '  "parent_id" INTEGER NULL'
+                if parent:
+                    parent_def += f' REFERENCES "{parent}" ("id")'
+                col_defs = ['  "id" INTEGER PRIMARY KEY', parent_def]
+                col_defs += [f'  "{c}" {ctype}' for c, ctype in zip(cols, ctypes)]
+                conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (\n' + ',\n'.join(col_defs) + '\n)')
+
+                col_list = ', '.join(['"'+c+'"' for c in ['id', 'parent_id'] + cols])
+                marks = ', '.join(['?'] * (len(cols) + 2))
+                converters = [_db_converter(ctype) for ctype in ctypes]
+                rows = (
+                    (rid, None if parent_id is None else int(parent_id),
+                     *[conv(v) for conv, v in zip(converters, row)])
+                    for rid, parent_id, *row in tb.iter_rows(table, cols)
+                )
+                conn.executemany(f'INSERT INTO "{table}" ({col_list}) VALUES ({marks})', rows)
+                instrument.count('rows', tb.tables[table].size)
+
+            # indexes are cheaper to build once than to maintain per insert
+            with instrument.stage('json_db.index'):
+                for table in tb.tables:
+                    conn.execute(f'CREATE INDEX IF NOT EXISTS "{table}_parent_id" ON "{table}" ("parent_id")')
+    finally:
+        conn.close()
+
+    return list(tb.tables.keys())
+
+
+def _write_db(tb: TableBuilder, db_path: str):
+    outp = Path(db_path)
+    outp.parent.mkdir(parents=True, exist_ok=True)
+    # start from an empty database; rows carry fixed ids
+    outp.unlink(missing_ok=True)
+    tables = tables_to_sqlite(tb, str(outp))
+    return str(outp), tables
+
+
+def json_to_sqlite(input_path: str, db_path: str, root_table_name: str = None):
+    """Read the JSON file at input_path and load it into a new SQLite file."""
+    tb = json_file_to_tables(input_path, root_table_name)
+    return _write_db(tb, db_path)
+
+
+# chaining hooks (see planner.py): read and load are shared with json_sql
+transform = json_to_tables
+
+
+def write(tb: TableBuilder, db_path: str):
+    _write_db(tb, db_path)
+
+
+def convert(file_name, input_file, output_file):
+    out_file, tables = json_to_sqlite(input_file, output_file)
+    print(f"JSON {input_file} loaded into {out_file} ({len(tables)} tables)")
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Load JSON into an SQLite database')
+    parser.add_argument('input', help='input JSON file path')
+    parser.add_argument('--out', help='output SQLite file path', default='data/db/output.db')
+    parser.add_argument('--root', help='root table name', default=None)
+    args = parser.parse_args()
+
+    out_file, created_tables = json_to_sqlite(args.input, args.out, args.root)
+    print('Wrote database to', out_file)
+    print('Created tables:', created_tables)
@@ -6,21 +6,37 @@ imported into SQLite/Postgres/MySQL easily.
 
 Behavior:
 - Create one table per object node path (table names sanitized)
-- Each table gets an id INTEGER PRIMARY KEY and parent_id INTEGER NULL
+- Each table gets an id INTEGER PRIMARY KEY and parent_id INTEGER NULL,
+  which holds the id of the row the nested object or list belongs to
 - Scalar fields become columns; lists are converted into child tables
 - Try to infer basic column types (INTEGER, REAL, TEXT) from sample values
 - Output: one SQL file written to data/sql/<base>_relational.sql
+- Output dialects: per-row INSERTs (default), batched multi-row INSERTs,
+  Postgres COPY blocks, or an SQLite bulk-load script
+- Statements are streamed to the file, optionally gzip/zstd compressed
+- Diff mode writes only the ALTER/INSERT/UPDATE/DELETE statements needed
+  to update a database loaded by the previous diff run
 
 This is a conservative, portable SQL generator aimed at quick imports.
+Run from the repository root as: python -m src.json_sql <input.json>
 """
 
 from pathlib import Path
+from array import array
+from itertools import islice, repeat
 import json
 import re
-from collections import defaultdict
-from typing import Any, Dict, List, Tuple
+from collections import defaultdict, deque
+from functools import lru_cache
+import gzip
+import os
+import pickle
+from typing import IO, Any, Dict, Iterator, List, Tuple
 
+from . import instrument
 
+
+@lru_cache(maxsize=None)
 def _sanitize_ident(name: str) -> str:
     # Lowercase, alnum and underscores only, cannot start with digit
     s = re.sub(r"[^0-9a-zA-Z_]+", "_", name)
@@ -33,198 +49,809 @@ def _sanitize_ident(name: str) -> str:
     return s
 
 
+# Column type lattice: a column only ever moves up, INTEGER -> REAL -> TEXT
+_TYPE_NAMES = ('INTEGER', 'REAL', 'TEXT')
+_INTEGER, _REAL, _TEXT = range(3)
+
+
+def _value_type(v: Any) -> int:
+    """Lattice rank of a single non-empty value."""
+    if isinstance(v, bool):
+        return _REAL
+    if isinstance(v, int):
+        return _INTEGER
+    if isinstance(v, float):
+        return _REAL
+    # same as matching -?\d+ and -?\d+\.\d+, without the regex
+    s = str(v)
+    if s[:1] == '-':
+        s = s[1:]
+    if s.isdecimal():
+        return _INTEGER
+    head, dot, tail = s.partition('.')
+    if dot and head.isdecimal() and tail.isdecimal():
+        return _REAL
+    return _TEXT
+
+
 def _infer_type(values: List[Any]) -> str:
     # Simple inference: if all ints -> INTEGER, if all numbers -> REAL, else TEXT
-    has_real = False
-    has_text = False
+    rank = _INTEGER
     for v in values:
         if v is None or v == '':
             continue
-        if isinstance(v, bool):
-            has_real = True
-            continue
-        try:
-            if isinstance(v, (int,)):
-                continue
-            if isinstance(v, float):
-                has_real = True
-                continue
-            s = str(v)
-            if re.fullmatch(r"-?\d+", s):
-                continue
-            if re.fullmatch(r"-?\d+\.\d+", s):
-                has_real = True
-                continue
-            has_text = True
-        except Exception:
-            has_text = True
-    if has_text:
-        return 'TEXT'
-    if has_real:
-        return 'REAL'
-    return 'INTEGER'
+        rank = max(rank, _value_type(v))
+        if rank == _TEXT:
+            break
+    return _TYPE_NAMES[rank]
+
+
+_INT_MIN, _INT_MAX = -(1 << 63), (1 << 63) - 1
+
+
+class _Column:
+    """Values of one column, stored as a typed array while the values allow.
+
+    A column of plain ints lives in an array('q'), plain floats in an
+    array('d'); the first value of any other type turns it into a list of
+    objects. NULLs are tracked in a parallel bytearray.
+    """
+
+    __slots__ = ('kind', 'data', 'nulls')
+
+    def __init__(self, size: int = 0):
+        # backfill NULLs for rows added before this column appeared;
+        # the first real value picks the kind
+        self.kind = None
+        self.data = array('q', bytes(8 * size))
+        self.nulls = bytearray(b'\x01' * size)
+
+    def _retype(self, kind: str):
+        if kind == 'float':
+            self.data = array('d', self.data)
+        elif kind == 'obj':
+            self.data = [None if n else v for v, n in zip(self.data, self.nulls)]
+        self.kind = kind
+
+    def append(self, v: Any):
+        if v is None:
+            self.nulls.append(1)
+            self.data.append(None if self.kind == 'obj' else 0)
+            return
+        if self.kind != 'obj':
+            if type(v) is int and _INT_MIN <= v <= _INT_MAX:
+                kind = 'int'
+            elif type(v) is float:
+                kind = 'float'
+            else:
+                kind = 'obj'
+            if kind != self.kind:
+                if self.kind is not None:
+                    # mixed kinds fall back to a list of objects
+                    kind = 'obj'
+                if kind == 'int':
+                    self.kind = kind
+                else:
+                    self._retype(kind)
+        self.nulls.append(0)
+        self.data.append(v)
+
+    def extend(self, other: '_Column', offset: int = 0):
+        """Append the values of other, adding offset to the non-NULL ones (for ids).
+
+        The kind changes exactly as if other's values had been appended one
+        by one.
+        """
+        if other.kind is None:
+            # only NULLs
+            if self.kind == 'obj':
+                self.data.extend(repeat(None, len(other.nulls)))
+            else:
+                self.data.extend(array(self.data.typecode, bytes(self.data.itemsize * len(other.nulls))))
+            self.nulls.extend(other.nulls)
+            return
+        data = other.data
+        if offset:
+            # the placeholders of NULLs are shifted too, but stay ignored
+            data = (array('q', map(offset.__add__, data)) if other.kind == 'int'
+                    else [None if v is None else v + offset for v in data])
+        if self.kind is None:
+            self._retype(other.kind)
+        elif self.kind != other.kind and self.kind != 'obj':
+            # mixed kinds fall back to a list of objects
+            self._retype('obj')
+        if self.kind == 'obj' and other.kind != 'obj':
+            data = [None if n else v for v, n in zip(data, other.nulls)]
+        self.data.extend(data)
+        self.nulls.extend(other.nulls)
+
+    def __iter__(self):
+        if self.kind == 'obj':
+            return iter(self.data)
+        return (None if n else v for v, n in zip(self.data, self.nulls))
+
+
+class _Table:
+    """Columnar rows of one table; ids are implicit (row index + 1)."""
+
+    __slots__ = ('index', 'size')
+
+    def __init__(self):
+        # column name -> _Column, shared by every row of the table
+        self.index: Dict[str, _Column] = {}
+        self.size = 0
+
+
+class AmbiguousParentError(ValueError):
+    """Rows of one table refer to different parent tables."""
 
 
 class TableBuilder:
     def __init__(self):
-        # mapping: table_name -> list of rows (dicts)
-        self.tables: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        # mapping: table_name -> columnar table
+        self.tables: Dict[str, _Table] = defaultdict(_Table)
         # per-table counters to generate synthetic integer ids
         self.counters: Dict[str, int] = defaultdict(int)
-
-    def add_row(self, table: str, row: Dict[str, Any]) -> int:
-        """Add a row to a table, assign a sequential integer id, and return it."""
+        # per-table column -> lattice rank, updated as rows are added
+        self.col_types: Dict[str, Dict[str, int]] = defaultdict(dict)
+        # text values are pooled so repeated strings are stored once
+        self.strings: Dict[str, str] = {}
+        # table -> table its parent_id refers to (None if ambiguous)
+        self.parents: Dict[str, str] = {}
+
+    def add_row(self, table: str, row: Dict[str, Any], parent_table: str = None) -> int:
+        """Add a row to a table, assign a sequential integer id, and return it.
+
+        parent_table names the table that the row's parent_id refers to.
+        """
         # assign id
         self.counters[table] += 1
         assigned = self.counters[table]
-        # ensure id stored as integer
-        row = dict(row)
-        row['id'] = assigned
+        if parent_table is not None and self.parents.setdefault(table, parent_table) != parent_table:
+            # two different parents sanitized to one table name
+            self.parents[table] = None
+        # the id is the row's position, so it is not stored;
         # parent_id may be provided already in row
-        self.tables[table].append(row)
+        t = self.tables[table]
+        index = t.index
+        for c in row:
+            if c != 'id' and c not in index:
+                index[c] = _Column(t.size)
+        strings = self.strings
+        for c, col in index.items():
+            v = row.get(c)
+            if type(v) is str:
+                v = strings.setdefault(v, v)
+            col.append(v)
+        t.size += 1
+
+        # widen column types with this row's values
+        types = self.col_types[table]
+        for c, v in row.items():
+            if c == 'id' or c == 'parent_id':
+                continue
+            rank = types.get(c, _INTEGER)
+            if rank != _TEXT and v is not None and v != '':
+                rank = max(rank, _value_type(v))
+            types[c] = rank
         return assigned
 
-    def build_sql(self, root_name: str) -> Tuple[str, List[str]]:
-        # For each table determine column types
-        create_stmts = []
-        insert_stmts = []
-
-        for table, rows in self.tables.items():
-            cols = set()
-            for r in rows:
-                cols.update(r.keys())
-            # ensure id and parent_id exist
-            cols.discard('id')
-            cols.discard('parent_id')
-            cols = sorted(cols)
-
-            # collect sample values
-            samples = {c: [] for c in cols}
-            for r in rows:
-                for c in cols:
-                    samples[c].append(r.get(c))
-
-            col_defs = []
-            for c in cols:
-                col_type = _infer_type(samples[c])
-                col_defs.append(f'  "{c}" {col_type}')
-
-            # map column types for insert formatting
-            col_types = {c: _infer_type(samples[c]) for c in cols}
+    def merge(self, other: 'TableBuilder'):
+        """Append the rows of other as if they had been added after the rows of self.
+
+        Ids in other are shifted past the rows already in each table and
+        parent_id values by the offset of the table they refer to, so ids
+        stay dense and the result equals building both in one TableBuilder.
+        other is consumed. Raises AmbiguousParentError if a table's rows
+        refer to more than one parent table, since their parent ids could
+        not be told apart.
+        """
+        offsets = {table: self.counters.get(table, 0) for table in other.tables}
+        for table, theirs in other.tables.items():
+            parent = other.parents.get(table)
+            if table in other.parents:
+                # None marks a table whose rows already had several parents
+                if parent is None or self.parents.setdefault(table, parent) != parent:
+                    raise AmbiguousParentError(f"Table '{table}' has rows of more than one parent table")
+            parent_offset = offsets.get(parent, 0)
+
+            mine = self.tables[table]
+            index = mine.index
+            for c in theirs.index:
+                if c not in index:
+                    index[c] = _Column(mine.size)
+            for c, col in index.items():
+                if c in theirs.index:
+                    col.extend(theirs.index[c], parent_offset if c == 'parent_id' else 0)
+                else:
+                    col.extend(_Column(theirs.size))
+            mine.size += theirs.size
+            self.counters[table] += other.counters[table]
+
+            # ranks only ever widen, so merged types are the maximum
+            types = self.col_types[table]
+            for c, rank in other.col_types[table].items():
+                types[c] = max(types.get(c, rank), rank)
+
+    def columns(self, table: str) -> List[str]:
+        """Data columns of table (without id and parent_id), sorted."""
+        return sorted(self.col_types[table])
+
+    def column_type(self, table: str, col: str) -> str:
+        """Inferred SQL type (INTEGER, REAL or TEXT) of a data column."""
+        return _TYPE_NAMES[self.col_types[table][col]]
+
+    def iter_rows(self, table: str, cols: List[str]) -> Iterator[Tuple[Any, ...]]:
+        """Yield (id, parent_id, *values of cols) for every row of table."""
+        t = self.tables[table]
+        index = t.index
+        # absent columns read as NULL; each needs its own iterator
+        parent = index.get('parent_id') or repeat(None, t.size)
+        values = [index.get(c) or repeat(None, t.size) for c in cols]
+        return zip(range(1, t.size + 1), parent, *values)
+
+    def build_sql(self, root_name: str, dialect: str = 'insert', batch_size: int = 500) -> Tuple[str, List[str]]:
+        """Render every table as one SQL script string; see iter_sql."""
+        sql = ''.join(self.iter_sql(root_name, dialect, batch_size))
+        return sql, list(self.tables.keys())
+
+    def write_sql(self, fp: IO[str], root_name: str, dialect: str = 'insert', batch_size: int = 500) -> List[str]:
+        """Stream the SQL script to the text file fp and return the table names."""
+        write = fp.write
+        for chunk in self.iter_sql(root_name, dialect, batch_size):
+            write(chunk)
+        return list(self.tables.keys())
+
+    def iter_sql(self, root_name: str, dialect: str = 'insert', batch_size: int = 500) -> Iterator[str]:
+        """Yield the SQL script in chunks, one statement or block at a time.
+
+        Only one statement (or one multi-row batch) is rendered at a time, so
+        memory does not grow with the size of the output.
+
+        Dialects:
+        - insert: one INSERT statement per row (portable, the default)
+        - multirow: INSERT ... VALUES (...),(...) with batch_size rows each
+        - copy: Postgres COPY ... FROM stdin blocks
+        - sqlite: PRAGMAs for bulk loading, multi-row INSERTs, one
+          transaction and parent_id indexes created after the data
+        """
+        if dialect not in SQL_DIALECTS:
+            raise ValueError(f"Unknown SQL dialect '{dialect}', expected one of {', '.join(SQL_DIALECTS)}")
+
+        # statements are separated by a blank line
+        sep = '\n\n'
+        yield f'-- Relational SQL for {root_name}'
+        if dialect == 'sqlite':
+            # journal and fsync settings cannot change inside a transaction
+            yield sep + 'PRAGMA journal_mode = MEMORY;'
+            yield sep + 'PRAGMA synchronous = OFF;'
+        yield sep + 'BEGIN TRANSACTION;'
+
+        if dialect in ('insert', 'multirow'):
+            id_def = '  "id" INTEGER PRIMARY KEY AUTOINCREMENT'
+        else:
+            # ids are always given explicitly, so no sequence is needed
+            id_def = '  "id" INTEGER PRIMARY KEY'
+
+        # column types were tracked in add_row; no rescan needed
+        schema = {}
+        for table in self.tables:
+            col_types = {c: _TYPE_NAMES[rank] for c, rank in self.col_types[table].items()}
+            cols = self.columns(table)
+            schema[table] = (cols, [col_types[c] for c in cols])
+
+            col_defs = [f'  "{c}" {col_types[c]}' for c in cols]
 
             # add id and parent_id
-            col_defs = ['  "id" INTEGER PRIMARY KEY AUTOINCREMENT', '  "parent_id" INTEGER NULL'] + col_defs
-
-            create = f"CREATE TABLE IF NOT EXISTS \"{table}\" (\n" + ',\n'.join(col_defs) + '\n);'
-            create_stmts.append(create)
-
-            # inserts
-            for r in rows:
-                cols_order = ['id', 'parent_id'] + cols
-                vals = []
-                for c in cols_order:
-                    v = r.get(c)
-                    # determine how to render value based on column type
-                    if c == 'id' or c == 'parent_id':
-                        # numeric ids
-                        if v is None:
-                            vals.append('NULL')
-                        else:
-                            vals.append(str(int(v)))
+            col_defs = [id_def, '  "parent_id" INTEGER NULL'] + col_defs
+
+            yield sep + f"CREATE TABLE IF NOT EXISTS \"{table}\" (\n" + ',\n'.join(col_defs) + '\n);'
+
+        yield sep
+
+        for table, (cols, ctypes) in schema.items():
+            # data, rendered straight from the columns
+            cols_order = ['id', 'parent_id'] + cols
+            col_list = ', '.join(['"'+c+'"' for c in cols_order])
+            rows = self.iter_rows(table, cols)
+
+            if dialect == 'copy':
+                yield sep + f'COPY "{table}" ({col_list}) FROM stdin;'
+                for rid, parent_id, *row in rows:
+                    vals = [str(rid), '\\N' if parent_id is None else str(int(parent_id))]
+                    vals.extend(_copy_value(v, ctype) for v, ctype in zip(row, ctypes))
+                    # rows of one COPY block are separated by single newlines
+                    yield '\n' + '\t'.join(vals)
+                yield '\n\\.'
+            else:
+                prefix = f'INSERT INTO "{table}" ({col_list}) VALUES'
+                tuples = (_render_row(rid, parent_id, row, ctypes) for rid, parent_id, *row in rows)
+                if dialect == 'insert':
+                    for t in tuples:
+                        yield sep + prefix + ' ' + t + ';'
+                else:
+                    while True:
+                        batch = list(islice(tuples, batch_size))
+                        if not batch:
+                            break
+                        yield sep + prefix + '\n' + ',\n'.join(batch) + ';'
+
+        if dialect in ('copy', 'sqlite') and schema:
+            yield sep
+            for table in schema:
+                yield sep + f'CREATE INDEX IF NOT EXISTS "{table}_parent_id" ON "{table}" ("parent_id");'
+
+        yield sep + 'COMMIT;'
+
+    def iter_diff_sql(self, old: 'TableBuilder', root_name: str) -> Iterator[str]:
+        """Yield the SQL that turns a database loaded from old into one loaded from self.
+
+        Rows are matched by id, so an edited value costs one UPDATE and
+        rows added or removed at the end of a table cost one INSERT each or
+        a single DELETE. Items inserted in the middle shift the ids after
+        them, which shows up as UPDATEs of the shifted rows. New tables
+        and columns are created, dropped ones are dropped; a table whose
+        column types changed is dropped and reloaded. Chunks are separated
+        as in iter_sql, using per-row statements.
+        """
+        sep = '\n\n'
+        id_def = '  "id" INTEGER PRIMARY KEY AUTOINCREMENT'
+        yield f'-- Relational SQL changes for {root_name}'
+        yield sep + 'BEGIN TRANSACTION;'
+
+        for table in old.tables:
+            if table not in self.tables:
+                yield sep + f'DROP TABLE IF EXISTS "{table}";'
+
+        for table in self.tables:
+            cols = self.columns(table)
+            ctypes = [self.column_type(table, c) for c in cols]
+            col_list = ', '.join('"' + c + '"' for c in ['id', 'parent_id'] + cols)
+            prefix = f'INSERT INTO "{table}" ({col_list}) VALUES '
+            old_types = old.col_types.get(table, {}) if table in old.tables else None
+            rows = self.iter_rows(table, cols)
+
+            if old_types is not None and any(old_types[c] != rank for c, rank in self.col_types[table].items()
+                                             if c in old_types):
+                # a column type changed, which ALTER TABLE cannot do portably
+                yield sep + f'DROP TABLE IF EXISTS "{table}";'
+                old_types = None
+            if old_types is None:
+                col_defs = [id_def, '  "parent_id" INTEGER NULL'] + [f'  "{c}" {t}' for c, t in zip(cols, ctypes)]
+                yield sep + f"CREATE TABLE IF NOT EXISTS \"{table}\" (\n" + ',\n'.join(col_defs) + '\n);'
+                for rid, parent_id, *row in rows:
+                    yield sep + prefix + _render_row(rid, parent_id, row, ctypes) + ';'
+                continue
+
+            for c in sorted(old_types):
+                if c not in self.col_types[table]:
+                    yield sep + f'ALTER TABLE "{table}" DROP COLUMN "{c}";'
+            for c, ctype in zip(cols, ctypes):
+                if c not in old_types:
+                    yield sep + f'ALTER TABLE "{table}" ADD COLUMN "{c}" {ctype};'
+
+            size = self.tables[table].size
+            if old.tables[table].size > size:
+                yield sep + f'DELETE FROM "{table}" WHERE "id" > {size};'
+
+            # columns the old table lacks read as NULL, like the rows after ADD COLUMN
+            names = ['parent_id'] + cols
+            types = ['INTEGER'] + ctypes
+            old_rows = old.iter_rows(table, cols)
+            # old_rows first: zip stops on it without taking a row from rows
+            for (_, *prev), (rid, *new) in zip(old_rows, rows):
+                if new == prev and all(type(a) is type(b) for a, b in zip(new, prev)):
+                    continue
+                sets = [f'"{c}" = {_render_value(a, t)}' for c, t, a, b in zip(names, types, new, prev)
+                        if a != b or type(a) is not type(b)]
+                yield sep + f'UPDATE "{table}" SET {", ".join(sets)} WHERE "id" = {rid};'
+            # rows past the end of the old table
+            for rid, parent_id, *row in rows:
+                yield sep + prefix + _render_row(rid, parent_id, row, ctypes) + ';'
+
+        yield sep + 'COMMIT;'
+
+
+SQL_DIALECTS = ('insert', 'multirow', 'copy', 'sqlite')
+
+
+def _render_value(v: Any, ctype: str) -> str:
+    """Render one value as an SQL literal for a column of type ctype."""
+    if v is None:
+        return 'NULL'
+    if ctype in ('INTEGER', 'REAL'):
+        # try to render numeric without quotes
+        try:
+            if ctype == 'INTEGER':
+                return str(int(v))
+            return str(float(v))
+        except Exception:
+            pass
+    s = str(v).replace("'", "''")
+    return f"'{s}'"
+
+
+def _render_row(rid: int, parent_id: Any, row: List[Any], ctypes: List[str]) -> str:
+    """Render one row as a parenthesized VALUES tuple."""
+    # numeric ids
+    vals = [str(rid), 'NULL' if parent_id is None else str(int(parent_id))]
+    vals.extend(_render_value(v, ctype) for v, ctype in zip(row, ctypes))
+    return '(' + ', '.join(vals) + ')'
+
+
+# backslash first so the escapes added after it are left alone
+_COPY_ESCAPES = (('\\', '\\\\'), ('\t', '\\t'), ('\n', '\\n'), ('\r', '\\r'))
+
+
+def _copy_value(v: Any, ctype: str) -> str:
+    """Render one value as a field of a Postgres COPY text-format row."""
+    if v is None:
+        return '\\N'
+    if ctype in ('INTEGER', 'REAL'):
+        try:
+            if ctype == 'INTEGER':
+                return str(int(v))
+            return str(float(v))
+        except Exception:
+            pass
+    s = str(v)
+    for ch, esc in _COPY_ESCAPES:
+        s = s.replace(ch, esc)
+    return s
+
+
+def _walk(tb: TableBuilder, node: Any, table_path: str, parent_id_val: Any = None, parent_table: str = None):
+    """Add node (and everything below it) to tb as rows of table_path."""
+    table_name = _sanitize_ident(table_path)
+
+    if isinstance(node, dict):
+        # collect scalars for this row
+        row = {}
+        for k, v in node.items():
+            if isinstance(v, (dict, list)):
+                continue
+            row[k] = v
+
+        # set parent link
+        row['parent_id'] = parent_id_val
+        # placeholder id will be generated on insert; keep as NULL
+        row['id'] = None
+        row_id = tb.add_row(table_name, row, parent_table)
+
+        # For nested lists/dicts create child rows; ids are assigned as rows
+        # are added, so children can reference this row's id directly
+        for k, v in node.items():
+            child_path = f"{table_path}_{k}" if table_path else k
+            if isinstance(v, dict):
+                _walk(tb, v, child_path, row_id, table_name)
+            elif isinstance(v, list):
+                for item in v:
+                    if isinstance(item, dict):
+                        _walk(tb, item, child_path, row_id, table_name)
                     else:
-                        ctype = col_types.get(c, 'TEXT')
-                        if v is None:
-                            vals.append('NULL')
-                        else:
-                            if ctype in ('INTEGER', 'REAL'):
-                                # try to render numeric without quotes
-                                try:
-                                    if ctype == 'INTEGER':
-                                        vals.append(str(int(v)))
-                                    else:
-                                        vals.append(str(float(v)))
-                                except Exception:
-                                    s = str(v).replace("'", "''")
-                                    vals.append(f"'{s}'")
-                            else:
-                                s = str(v).replace("'", "''")
-                                vals.append(f"'{s}'")
-                insert = f"INSERT INTO \"{table}\" ({', '.join(['"'+c+'"' for c in cols_order])}) VALUES ({', '.join(vals)});"
-                insert_stmts.append(insert)
-
-        header = [f'-- Relational SQL for {root_name}', 'BEGIN TRANSACTION;']
-        footer = ['COMMIT;']
-        sql = '\n\n'.join(header + create_stmts + [''] + insert_stmts + footer)
-        return sql, list(self.tables.keys())
+                        # atomic list -> create a child row with 'value'
+                        _walk(tb, { 'value': item }, child_path, row_id, table_name)
 
+    elif isinstance(node, list):
+        for item in node:
+            _walk(tb, item, table_path, parent_id_val, parent_table)
 
-def json_to_relational_sql(input_json: Any, out_sql_path: str, root_table_name: str = None):
-    """Convert a loaded JSON object into relational SQL and write to out_sql_path."""
-    tb = TableBuilder()
+    else:
+        # scalar at root
+        tb.add_row(_sanitize_ident(table_path or 'root'), {'value': node, 'parent_id': parent_id_val, 'id': None},
+                   parent_table)
 
-    def recurse(node, table_path, parent_id_name='parent_id', parent_id_val=None):
-        table_name = _sanitize_ident(table_path)
 
-        if isinstance(node, dict):
-            # collect scalars for this row
-            row = {}
-            for k, v in node.items():
-                if isinstance(v, (dict, list)):
-                    continue
-                row[k] = v
-
-            # set parent link
-            row['parent_id'] = parent_id_val
-            # placeholder id will be generated on insert; keep as NULL
-            row['id'] = None
-            tb.add_row(table_name, row)
-
-            # For nested lists/dicts create child rows
-            for k, v in node.items():
-                child_path = f"{table_path}_{k}" if table_path else k
-                if isinstance(v, dict):
-                    recurse(v, child_path, parent_id_val=None)
-                elif isinstance(v, list):
-                    for item in v:
-                        if isinstance(item, dict):
-                            # child row will reference this parent's id
-                            # We cannot know the parent's id at SQL generation time, so store NULL parent_id.
-                            recurse(item, child_path, parent_id_val=None)
-                        else:
-                            # atomic list -> create a child row with 'value'
-                            recurse({ 'value': item }, child_path, parent_id_val=None)
-
-        elif isinstance(node, list):
-            for item in node:
-                recurse(item, table_path, parent_id_val=None)
+# compression name -> file suffix
+SQL_COMPRESSIONS = {'gzip': '.gz', 'zstd': '.zst'}
 
-        else:
-            # scalar at root
-            tb.add_row(_sanitize_ident(table_path or 'root'), {'value': node, 'parent_id': parent_id_val, 'id': None})
 
-    # entry
-    root_name = root_table_name or (input_json.get('name') if isinstance(input_json, dict) and 'name' in input_json else 'root')
-    recurse(input_json, root_name)
+def open_sql_output(path: Path, compression: str = None) -> IO[str]:
+    """Open path for writing SQL text, through a compressor if one is named."""
+    if compression is None:
+        return open(path, 'w', encoding='utf-8')
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError('zstd compression requires the zstandard package') from e
+        return zstandard.open(path, 'wt', encoding='utf-8')
+    raise ValueError(f"Unknown compression '{compression}', expected one of {', '.join(SQL_COMPRESSIONS)}")
+
+
+def snapshot_path(out_sql_path: str) -> Path:
+    """Where diff mode keeps the tables of the last run written to out_sql_path."""
+    outp = Path(out_sql_path)
+    return outp.with_name(f'.{outp.name}.snapshot')
+
+
+def load_snapshot(path: Path) -> TableBuilder:
+    """Load a snapshot saved by diff mode; an empty TableBuilder if there is none."""
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return TableBuilder()
+
 
-    sql_text, tables = tb.build_sql(Path(out_sql_path).stem)
+def save_snapshot(tb: TableBuilder, path: Path):
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        pickle.dump(tb, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def _write_sql(tb: TableBuilder, out_sql_path: str, dialect: str = 'insert', batch_size: int = 500,
+               compression: str = None, diff: bool = False):
+    if diff and dialect != 'insert':
+        raise ValueError("Diff output is written as per-row statements; use the 'insert' dialect")
     outp = Path(out_sql_path)
+    root_name = outp.stem
+    if compression in SQL_COMPRESSIONS:
+        suffix = SQL_COMPRESSIONS[compression]
+        if outp.suffix == suffix:
+            root_name = Path(outp.stem).stem
+        else:
+            outp = outp.with_name(outp.name + suffix)
     outp.parent.mkdir(parents=True, exist_ok=True)
-    outp.write_text(sql_text, encoding='utf-8')
+    # statements are streamed to disk; the full script is never built in memory
+    with instrument.stage('json_sql.render', dialect=dialect, diff=diff):
+        if diff:
+            # only the changes since the snapshot of the last diff run; the
+            # first run has an empty snapshot and writes the full load
+            snapshot = snapshot_path(outp)
+            old = load_snapshot(snapshot)
+            with open_sql_output(outp, compression) as f:
+                for chunk in tb.iter_diff_sql(old, root_name):
+                    f.write(chunk)
+            save_snapshot(tb, snapshot)
+            tables = list(tb.tables.keys())
+        else:
+            with open_sql_output(outp, compression) as f:
+                tables = tb.write_sql(f, root_name, dialect, batch_size)
+        instrument.count('bytes', outp.stat().st_size)
 
     return str(outp), tables
 
 
+def json_to_tables(input_json: Any, root_table_name: str = None) -> TableBuilder:
+    """Build the relational tables for a loaded JSON object."""
+    tb = TableBuilder()
+
+    # entry
+    root_name = root_table_name or (input_json.get('name') if isinstance(input_json, dict) and 'name' in input_json else 'root')
+    # type inference happens as rows are added, so it is part of this stage
+    with instrument.stage('json_sql.tables'):
+        _walk(tb, input_json, root_name)
+        instrument.count('rows', sum(tb.counters.values()))
+    return tb
+
+
+def json_to_relational_sql(input_json: Any, out_sql_path: str, root_table_name: str = None,
+                           dialect: str = 'insert', batch_size: int = 500, compression: str = None,
+                           diff: bool = False):
+    """Convert a loaded JSON object into relational SQL and write to out_sql_path.
+
+    With diff, write only the statements that update a database loaded
+    from the previous diff run (see TableBuilder.iter_diff_sql).
+    """
+    tb = json_to_tables(input_json, root_table_name)
+    return _write_sql(tb, out_sql_path, dialect, batch_size, compression, diff)
+
+
+_JSON_WS = ' \t\n\r'
+_JSON_NUMBER_TAIL = '0123456789+-.eE'
+
+
+def iter_json_items(fp, chunk_size: int = 1 << 16, raw: bool = False):
+    """Yield the items of a top-level JSON array read incrementally from fp.
+
+    Only the item being decoded is held in memory, never the whole document.
+    With raw=True each item's JSON text is yielded instead of its value.
+    Raises json.JSONDecodeError on malformed input, as json.load would.
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+
+    def more():
+        nonlocal buf, pos, eof
+        # read at least as much as is buffered so retries stay linear
+        chunk = fp.read(max(chunk_size, len(buf) - pos))
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _JSON_WS:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            more()
+
+    def decode():
+        nonlocal pos
+        skip_ws()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+                # a number cut at the end of the buffer may continue in the next chunk
+                if eof or (end < len(buf) and buf[end] not in _JSON_NUMBER_TAIL):
+                    start, pos = pos, end
+                    return buf[start:end] if raw else value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            more()
+
+    def expect(chars, msg):
+        nonlocal pos
+        skip_ws()
+        c = buf[pos:pos + 1]
+        if not c or c not in chars:
+            raise json.JSONDecodeError(msg, buf, pos)
+        pos += 1
+        return c
+
+    expect('[', 'Expecting top-level array')
+    skip_ws()
+    if buf[pos:pos + 1] == ']':
+        pos += 1
+    else:
+        while True:
+            yield decode()
+            if expect(',]', "Expecting ',' delimiter") == ']':
+                break
+
+    skip_ws()
+    if pos < len(buf):
+        raise json.JSONDecodeError('Extra data', buf, pos)
+
+
+def _shard_tables(texts: List[str], root_name: str) -> TableBuilder:
+    """Build the tables of a run of top-level items, given as JSON text (in a worker process)."""
+    tb = TableBuilder()
+    for text in texts:
+        _walk(tb, json.loads(text), root_name)
+    # only needed while building; saves pickling it back
+    tb.strings = {}
+    return tb
+
+
+def _sharded_tables(texts: Iterator[str], root_name: str, workers: int, shard_size: int) -> TableBuilder:
+    """Build tables for items in a process pool and merge the shards in order.
+
+    Shards are sent as JSON text, which pickles far faster than decoded items.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    tb = TableBuilder()
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for shard in iter(lambda: list(islice(texts, shard_size)), []):
+            pending.append(pool.submit(_shard_tables, shard, root_name))
+            # bound the shards and partial tables held at once
+            if len(pending) >= 2 * workers:
+                tb.merge(pending.popleft().result())
+        while pending:
+            tb.merge(pending.popleft().result())
+    return tb
+
+
+def json_file_to_tables(input_path: str, root_table_name: str = None, workers: int = 1,
+                        shard_size: int = 1000) -> TableBuilder:
+    """Read the JSON file at input_path into a TableBuilder.
+
+    A top-level array is decoded and added one item at a time; any other
+    document is loaded whole. With workers other than 1 (None for one per
+    CPU), runs of shard_size top-level items are turned into tables in a
+    process pool and merged; the result is identical to a serial run.
+    """
+    tb = TableBuilder()
+    with open(input_path, 'r', encoding='utf-8') as f:
+        first = f.read(1)
+        while first and first in _JSON_WS:
+            first = f.read(1)
+        f.seek(0)
+
+        if first != '[':
+            with instrument.stage('json_sql.read'):
+                instrument.count('bytes', os.path.getsize(input_path))
+                data = json.load(f)
+            return json_to_tables(data, root_table_name)
+
+        root_name = root_table_name or 'root'
+        # items are decoded and added in turn: reading and building are one stage
+        with instrument.stage('json_sql.read+tables', workers=workers):
+            if workers != 1:
+                try:
+                    tb = _sharded_tables(iter_json_items(f, raw=True), root_name, workers, shard_size)
+                except AmbiguousParentError:
+                    # shards cannot be remapped; build the tables serially instead
+                    f.seek(0)
+                    tb = TableBuilder()
+                    workers = 1
+            if workers == 1:
+                for item in iter_json_items(f):
+                    _walk(tb, item, root_name)
+            instrument.count('bytes', os.path.getsize(input_path))
+            instrument.count('rows', sum(tb.counters.values()))
+
+    return tb
+
+
+def json_file_to_relational_sql(input_path: str, out_sql_path: str, root_table_name: str = None,
+                                dialect: str = 'insert', batch_size: int = 500, compression: str = None,
+                                diff: bool = False, workers: int = 1):
+    """Like json_to_relational_sql, but read input_path incrementally.
+
+    The SQL written is identical to json_to_relational_sql(json.load(...)).
+    workers builds the tables of a top-level array in parallel (see
+    json_file_to_tables).
+    """
+    tb = json_file_to_tables(input_path, root_table_name, workers)
+    return _write_sql(tb, out_sql_path, dialect, batch_size, compression, diff)
+
+
+# chaining hooks (see planner.py): JSON data -> TableBuilder -> SQL file
+def read(input_path: str) -> Any:
+    with instrument.stage('json_sql.read'), open(input_path, 'r', encoding='utf-8') as f:
+        instrument.count('bytes', os.path.getsize(input_path))
+        return json.load(f)
+
+
+transform = json_to_tables
+
+
+def load(input_path: str) -> TableBuilder:
+    """read + transform, streaming a top-level array item by item (see json_file_to_tables)."""
+    return json_file_to_tables(input_path)
+
+
+def write(tb: TableBuilder, out_sql_path: str):
+    _write_sql(tb, out_sql_path)
+
+
+def convert(file_name, input_file, output_file):
+    out_file, tables = json_file_to_relational_sql(input_file, output_file)
+    print(f"JSON {input_file} converted to {out_file} ({len(tables)} tables)")
+
+
 if __name__ == '__main__':
     import argparse
+
+    def worker_count(text):
+        value = int(text)
+        if value < 0:
+            raise argparse.ArgumentTypeError(f'must be 0 or more, not {value}')
+        return value
+
     parser = argparse.ArgumentParser(description='Convert JSON to relational SQL file')
     parser.add_argument('input', help='input JSON file path')
     parser.add_argument('--out', help='output SQL file path', default='data/sql/output_relational.sql')
     parser.add_argument('--root', help='root table name', default=None)
+    parser.add_argument('--dialect', help='SQL output dialect', choices=SQL_DIALECTS, default='insert')
+    parser.add_argument('--batch-size', help='rows per multi-row INSERT', type=int, default=500)
+    parser.add_argument('--compress', help='compress the SQL output', choices=sorted(SQL_COMPRESSIONS), default=None)
+    parser.add_argument('--diff', help='write only the changes since the previous --diff run', action='store_true')
+    parser.add_argument('--workers', help='processes building the tables of a top-level array (0: one per CPU)',
+                        type=worker_count, default=1)
     args = parser.parse_args()
+    if args.compress == 'zstd':
+        from importlib.util import find_spec
+        if find_spec('zstandard') is None:
+            parser.error('--compress zstd needs the zstandard package (pip install zstandard)')
 
-    p = Path(args.input)
-    data = json.loads(p.read_text(encoding='utf-8'))
     out_path = args.out
-    out_file, created_tables = json_to_relational_sql(data, out_path, args.root)
+    out_file, created_tables = json_file_to_relational_sql(args.input, out_path, args.root,
+                                                           args.dialect, args.batch_size, args.compress,
+                                                           args.diff, args.workers or None)
     print('Wrote SQL to', out_file)
     print('Created tables:', created_tables)
@@ -0,0 +1,142 @@
+"""pipeline.py
+
+Overlap parsing and database work in the database converters.
+
+A loader that parses a chunk, writes it to the database, then parses the
+next leaves one side idle while the other runs. prefetch() runs the
+producing side in a background thread a bounded number of items ahead, so
+parsing chunk N+1 overlaps the database write of chunk N; drain() hands
+items to a consumer running in a background thread in the same way.
+
+The database side always stays on the calling thread, so connections and
+cursors are only used by the thread that opened them. The overlap comes
+from the database drivers releasing the GIL while they wait on the server
+(psycopg2) or execute statements (sqlite3).
+
+Behavior:
+- At most depth items are queued between the two sides, so memory stays
+  bounded by depth + 2 chunks
+- An exception on either side stops the other and is raised in the caller
+- depth=0 runs everything on the calling thread, as before
+"""
+
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar('T')
+
+_DONE = object()
+# how often a blocked side checks whether the other one gave up
+_POLL_SECONDS = 0.1
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Put item on q, waiting for space; False if stop was set meanwhile."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+@contextmanager
+def prefetch(items: Iterable[T], depth: int = 2) -> Iterator[Iterator[T]]:
+    """Iterate over items in a background thread, up to depth items ahead.
+
+    Use as `with prefetch(chunks) as chunks: for chunk in chunks: ...`; the
+    thread is stopped when the block exits, also if it exits early.
+    """
+    if depth <= 0:
+        yield iter(items)
+        return
+
+    q = queue.Queue(depth)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in items:
+                if not _put(q, item, stop):
+                    return
+            _put(q, _DONE, stop)
+        except BaseException as e:
+            _put(q, _Failure(e), stop)
+
+    def consume():
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+
+    thread = threading.Thread(target=produce, name='prefetch', daemon=True)
+    thread.start()
+    try:
+        yield consume()
+    finally:
+        stop.set()
+        thread.join()
+
+
+@contextmanager
+def drain(consumer: Callable[[T], None], depth: int = 2) -> Iterator[Callable[[T], None]]:
+    """Call consumer on each item put in a background thread, up to depth items behind.
+
+    Use as `with drain(write) as put: put(item)`; the block exits once every
+    item has been consumed. An error in consumer is raised from the next
+    put, or when the block exits.
+    """
+    if depth <= 0:
+        yield consumer
+        return
+
+    q = queue.Queue(depth)
+    stop = threading.Event()
+    failure = []
+
+    def consume():
+        try:
+            while True:
+                try:
+                    item = q.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    if stop.is_set():
+                        return
+                    continue
+                if item is _DONE or stop.is_set():
+                    return
+                consumer(item)
+        except BaseException as e:
+            failure.append(e)
+            stop.set()
+
+    def put(item: T):
+        if not _put(q, item, stop) or failure:
+            raise failure[0]
+
+    thread = threading.Thread(target=consume, name='drain', daemon=True)
+    thread.start()
+    try:
+        yield put
+    except BaseException:
+        stop.set()
+        thread.join()
+        raise
+    _put(q, _DONE, stop)
+    thread.join()
+    if failure:
+        raise failure[0]
+
+
+__all__ = ["drain", "prefetch"]
@@ -0,0 +1,235 @@
+"""planner.py
+
+Chain converter modules to reach formats that have no direct converter,
+e.g. txt -> yml -> json -> sql for txt -> sql.
+
+The converters declared in registry.py form a graph of formats; plan()
+finds the shortest chain with a breadth-first search. Planning imports no
+converter module; each stage's module is imported when the chain runs.
+
+Stages declared with hooks=True in the registry implement the chaining
+hooks and pass their result to the next stage in memory instead of
+writing and re-parsing an intermediate file:
+
+- read(input_path): parse an <in> file into in-memory data
+- transform(data): turn <in> data into <out> data (optional, identity if absent)
+- load(input_path): read and transform an <in> file in one pass (optional,
+  used instead of the two when the stage starts from a file, e.g. to
+  stream a large JSON array)
+- write(data, output_path): write <out> data as a file
+
+The outline dict from txt_yml, the yaml.safe_load result and the JSON
+object fed to json_sql are the same structure, so those hops cost nothing.
+A stage without the hooks falls back to convert() on files, and the data
+before it is written out first. So do streaming converters (txt -> yml,
+yml -> txt) when streaming is on (main.py --stream), since their hooks
+hold the whole document in memory. Those files go to a scratch directory
+that is removed once the chain has run. Intermediates are kept only when
+keep_intermediates is set, next to the output as ../<fmt>/<file_name>.<fmt>
+(data/<fmt>/ for the usual layout).
+
+With a ConversionCache (see cache.py), a chain made only of hook stages is
+skipped when its input is unchanged, and the in-memory result of each hook
+stage is cached so another chain over the same input resumes from it (the
+TableBuilder of json -> sql serves json -> db, and the other way round).
+"""
+
+import sys
+from collections import deque
+from functools import lru_cache
+from importlib import import_module
+from pathlib import Path
+from types import ModuleType
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import codec, instrument
+from .cache import MISS, ConversionCache, hash_file, stage_identity
+from .registry import available_converters, lookup
+
+_NO_DATA = object()
+
+
+def _stage_module(input_fmt: str, output_fmt: str) -> ModuleType:
+    return import_module(f'{__package__}.{input_fmt}_{output_fmt}')
+
+
+@lru_cache(maxsize=None)
+def converter_graph() -> Dict[str, List[str]]:
+    """Map each input format to the formats it converts to directly."""
+    return {fmt: [c.output_format for c in convs] for fmt, convs in available_converters().items()}
+
+
+def plan(input_fmt: str, output_fmt: str) -> List[Tuple[str, str]]:
+    """Return the shortest list of (in, out) stages from input_fmt to output_fmt.
+
+    Raises ImportError if no chain of converters connects the two formats.
+    """
+    graph = converter_graph()
+    previous = {input_fmt: None}
+    queue = deque([input_fmt])
+    while queue:
+        fmt = queue.popleft()
+        if fmt == output_fmt:
+            break
+        for nxt in graph.get(fmt, []):
+            if nxt not in previous:
+                previous[nxt] = fmt
+                queue.append(nxt)
+
+    if output_fmt not in previous or input_fmt == output_fmt:
+        raise ImportError(f'No conversion chain from {input_fmt} to {output_fmt}')
+
+    chain = []
+    fmt = output_fmt
+    while previous[fmt] is not None:
+        chain.append((previous[fmt], fmt))
+        fmt = previous[fmt]
+    return chain[::-1]
+
+
+def _chains_in_memory(stage: Tuple[str, str]) -> bool:
+    """Whether the stage runs through its hooks, as declared in the registry."""
+    info = lookup(*stage)
+    if info is None or not info.hooks:
+        return False
+    # while streaming, convert() streams; the hooks hold the whole document
+    return not (info.stream and codec.streaming())
+
+
+def _data_module(mod: ModuleType) -> ModuleType:
+    """The module whose code produces a stage's in-memory result.
+
+    Cached data is keyed on it, so stages that share a transform (json_sql
+    and json_db build the same TableBuilder) share their entries.
+    """
+    transform = getattr(mod, 'transform', None)
+    return sys.modules[transform.__module__] if transform is not None else mod
+
+
+def run_chain(chain: List[Tuple[str, str]], file_name: str, input_path: str, output_path: str,
+              keep_intermediates: bool = False, cache: Optional[ConversionCache] = None) -> None:
+    """Run the stages of chain, converting input_path to output_path."""
+    output_path = Path(output_path)
+    mods = [_stage_module(in_fmt, out_fmt) for in_fmt, out_fmt in chain]
+    in_memory = [_chains_in_memory(stage) for stage in chain]
+    # result of the previous stage if it is held in memory, and the
+    # (stage, path) needed to write it if it is not on disk yet
+    data = _NO_DATA
+    unwritten = None
+    current = Path(input_path)
+    start = 0
+
+    if cache is not None:
+        # keys[i] identifies the data after stage i; None once a file-only stage is involved
+        keys = []
+        parts = (hash_file(input_path),)
+        for mod, hooked in zip(mods, in_memory):
+            if parts is not None and hooked:
+                parts += (stage_identity(_data_module(mod)),)
+            else:
+                parts = None
+            keys.append(parts and cache.key(*parts))
+        # the codec mode changes the bytes written, not the data in memory
+        out_key = keys[-1] and cache.key(keys[-1], stage_identity(mods[-1]), file_name, output_path.name,
+                                         codec.mode())
+
+        # cache hits skip the stages whose intermediate files were asked for
+        if not keep_intermediates:
+            with instrument.stage('cache.lookup'):
+                if out_key and cache.restore_output(out_key, output_path):
+                    instrument.count('output_hits')
+                    print(f'{output_path} is up to date')
+                    return
+                # the last stage's data too: json -> db can reuse the tables of json -> sql
+                for i in range(len(mods) - 1, -1, -1):
+                    cached = cache.get_data(keys[i]) if keys[i] else MISS
+                    if cached is not MISS:
+                        instrument.count('data_hits')
+                        out_fmt = chain[i][1]
+                        data, start = cached, i + 1
+                        if i == len(mods) - 1:
+                            current = output_path
+                        else:
+                            current = output_path.parent.parent / out_fmt / f'{file_name}.{out_fmt}'
+                        unwritten = (mods[i], current)
+                        break
+
+    # intermediate files not asked for go to a scratch directory,
+    # removed once the chain has run
+    scratch_dir = None
+
+    def scratch() -> Path:
+        nonlocal scratch_dir
+        if scratch_dir is None:
+            import tempfile
+            scratch_dir = Path(tempfile.mkdtemp(prefix='dandoc-'))
+        return scratch_dir
+
+    try:
+        for i in range(start, len(chain)):
+            mod = mods[i]
+            out_fmt = chain[i][1]
+            last = i == len(chain) - 1
+            if last:
+                target = output_path
+            elif in_memory[i] or keep_intermediates:
+                target = output_path.parent.parent / out_fmt / f'{file_name}.{out_fmt}'
+            else:
+                # file only needed as the next stage's input
+                target = scratch() / f'{file_name}.{out_fmt}'
+
+            with instrument.stage(f'{chain[i][0]}_{out_fmt}'):
+                if not in_memory[i]:
+                    if unwritten is not None:
+                        # this stage only works on files: materialize the data before it
+                        current = unwritten[1] if keep_intermediates else scratch() / unwritten[1].name
+                        current.parent.mkdir(parents=True, exist_ok=True)
+                        unwritten[0].write(data, str(current))
+                    data, unwritten = _NO_DATA, None
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    mod.convert(file_name, str(current), str(target))
+                else:
+                    fresh = data is _NO_DATA
+                    if fresh and hasattr(mod, 'load'):
+                        data = mod.load(str(current))
+                    else:
+                        if fresh:
+                            data = mod.read(str(current))
+                        if hasattr(mod, 'transform'):
+                            data = mod.transform(data)
+                            fresh = True
+                    if cache is not None and fresh and keys[i]:
+                        # stages without transform pass data through unchanged; no need to store it twice
+                        with instrument.stage('cache.store'):
+                            cache.put_data(keys[i], data)
+                    if last or keep_intermediates:
+                        target.parent.mkdir(parents=True, exist_ok=True)
+                        mod.write(data, str(target))
+                        unwritten = None
+                    else:
+                        unwritten = (mod, target)
+            current = target
+
+        if unwritten is not None:
+            # every stage was served from the cache; only the output is left to write
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            unwritten[0].write(data, str(output_path))
+    finally:
+        if scratch_dir is not None:
+            import shutil
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    if cache is not None and out_key:
+        with instrument.stage('cache.store'):
+            cache.put_output(out_key, output_path)
+
+
+def chain_converter(chain: List[Tuple[str, str]], keep_intermediates: bool = False,
+                    cache: Optional[ConversionCache] = None) -> Callable[[str, str, str], None]:
+    """Wrap chain in the convert(file_name, input_path, output_path) signature."""
+    def convert(file_name: str, input_path: str, output_path: str) -> None:
+        run_chain(chain, file_name, input_path, output_path, keep_intermediates, cache)
+    return convert
+
+
+__all__ = ["converter_graph", "plan", "run_chain", "chain_converter"]
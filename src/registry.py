@@ -0,0 +1,76 @@
+"""registry.py
+
+Declare the converter modules, their formats and capabilities without
+importing them.
+
+Importing a converter pulls in its dependencies (yaml, psycopg2, ...), so
+finding out which conversions exist must not import anything; a module is
+only imported when one of its conversions actually runs. Add an entry here
+when adding a src/<in>_<out>.py converter.
+
+Capabilities:
+- requires: packages the converter cannot run without; a conversion whose
+  packages are not installed is left out of the graph
+- hooks: the module implements the read/transform/write chaining hooks
+  (see planner.py)
+- database: the converter talks to a database (convert takes conn/backend)
+- stream: convert() converts incrementally when streaming is on (see
+  codec.streaming()), so the planner runs it on files instead of its hooks
+"""
+
+from importlib.util import find_spec
+from typing import Dict, List, NamedTuple, Tuple
+
+
+class Converter(NamedTuple):
+    input_format: str
+    output_format: str
+    requires: Tuple[str, ...] = ()
+    hooks: bool = False
+    database: bool = False
+    stream: bool = False
+
+    @property
+    def module(self) -> str:
+        return f'{__package__}.{self.input_format}_{self.output_format}'
+
+    def available(self) -> bool:
+        """True if every required package is installed (checked without importing it)."""
+        return all(find_spec(name) is not None for name in self.requires)
+
+
+CONVERTERS: Tuple[Converter, ...] = (
+    Converter('txt', 'yml', requires=('yaml',), hooks=True, stream=True),
+    Converter('yml', 'json', requires=('yaml',), hooks=True),
+    Converter('yml', 'txt', requires=('yaml',), hooks=True, stream=True),
+    Converter('json', 'sql', hooks=True),
+    Converter('json', 'db', hooks=True),
+    # psycopg2 is needed for the default postgres backend only
+    Converter('csv', 'sql', database=True),
+    Converter('sql', 'csv', database=True),
+    # .xlsm workbooks are read exactly like .xlsx
+    Converter('xlsx', 'csv'),
+    Converter('xlsm', 'csv'),
+    Converter('xlsx', 'sql', database=True),
+    Converter('xlsm', 'sql', database=True),
+)
+
+
+def lookup(input_format: str, output_format: str) -> Converter:
+    """Return the registered converter for a format pair, or None."""
+    for c in CONVERTERS:
+        if (c.input_format, c.output_format) == (input_format, output_format):
+            return c
+    return None
+
+
+def available_converters() -> Dict[str, List[Converter]]:
+    """Map each input format to its usable converters, sorted by output format."""
+    graph: Dict[str, List[Converter]] = {}
+    for c in sorted(CONVERTERS, key=lambda c: (c.input_format, c.output_format)):
+        if c.available():
+            graph.setdefault(c.input_format, []).append(c)
+    return graph
+
+
+__all__ = ["Converter", "CONVERTERS", "lookup", "available_converters"]
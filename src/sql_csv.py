@@ -1,30 +1,103 @@
-import psycopg2
+"""sql_csv.py
+
+Run the SQL in input_file and, if it is a SELECT, export the result as CSV.
+
+Results are streamed: a named (server-side) cursor is read in fetchmany
+batches and written straight to the CSV, or with mode='copy' Postgres
+writes the CSV itself through COPY (query) TO STDOUT. Client memory stays
+constant no matter how large the result is.
+
+In cursor mode, batches are written to the CSV by a background thread
+while the next batch is fetched (see pipeline.py). Connections come from
+the configured pool, or are prompted for (see dbpool.py).
+"""
+
 import csv
-import pandas as pd
+import time
+
+from . import instrument
+from .dbpool import connection, default_backend
+from .pipeline import drain
+
+EXPORT_MODES = ('cursor', 'copy')
+
+
+def export_query(conn, sql, output_file, backend='postgres', mode='cursor', batch_size=10000, pipeline_depth=2):
+    """Stream the result of the SELECT sql into output_file as CSV.
+
+    Batch N is written while batch N+1 is fetched; pipeline_depth=0 does
+    one after the other. Returns the number of rows written.
+    """
+    if mode not in EXPORT_MODES:
+        raise ValueError(f"Unknown export mode '{mode}', expected one of {', '.join(EXPORT_MODES)}")
+    if mode == 'copy' and backend != 'postgres':
+        raise ValueError("COPY export needs the postgres backend")
 
-def convert(file_name, input_file, output_file):
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        if mode == 'copy':
+            cursor = conn.cursor()
+            query = sql.strip().rstrip(';')
+            with instrument.stage('sql_csv.copy'):
+                cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", f)
+                rows = cursor.rowcount
+                instrument.count('rows', rows)
+            cursor.close()
+            return rows
+
+        if backend == 'postgres':
+            # named cursors live on the server; only batch_size rows are sent at a time
+            cursor = conn.cursor(name='sql_csv_export')
+            cursor.itersize = batch_size
+        else:
+            cursor = conn.cursor()
+        writer = csv.writer(f)
+        rows = 0
+        with instrument.stage('sql_csv.query'):
+            cursor.execute(sql)
+            batch = cursor.fetchmany(batch_size)
+        # a server-side cursor only knows its columns after the first fetch
+        writer.writerow([desc[0] for desc in cursor.description])
+
+        def write(batch):
+            with instrument.stage('sql_csv.write'):
+                writer.writerows(batch)
+                instrument.count('rows', len(batch))
+
+        # the cursor stays on this thread
+        with drain(write, pipeline_depth) as put:
+            while batch:
+                put(batch)
+                rows += len(batch)
+                with instrument.stage('sql_csv.fetch'):
+                    batch = cursor.fetchmany(batch_size)
+        cursor.close()
+
+    return rows
+
+
+def convert(file_name, input_file, output_file, backend=None, mode='cursor', batch_size=10000, conn=None,
+            pipeline_depth=2):
+    """Run input_file on the database; conn is an open connection to reuse (and leave open).
+
+    Without conn, a connection is borrowed from the configured pool, or
+    opened from prompted credentials. backend defaults to the configured one.
+    """
     with open(input_file, 'r') as f:
-         sql = f.read()
-    database = input('d: ').strip()
-    table = file_name
-
-    schema = {}
-    conn = psycopg2.connect(database = database,
-                        user = 'postgres',
-                        password = 'c4dc3571c4794f10b3d7ba8c8d83e50f',
-                        host = 'localhost',
-                        port = 5432)
-    cursor = conn.cursor()
-    cursor.execute(sql)
-
-    if sql.strip().lower().startswith('select'):
-        rows = cursor.fetchall()
-        col_names = [desc[0] for desc in cursor.description]
-        df = pd.DataFrame(rows, columns=col_names)
-        df.to_csv(output_file, index=False)
-        print(f"Query result exported to {output_file}")
-    else:
+        sql = f.read()
+
+    backend = backend or default_backend()
+    with connection(backend, conn) as conn:
+        if sql.strip().lower().startswith('select'):
+            start = time.perf_counter()
+            rows = export_query(conn, sql, output_file, backend, mode, batch_size, pipeline_depth)
+            elapsed = time.perf_counter() - start
+            rate = rows / elapsed if elapsed > 0 else 0
+            print(f"Query result exported to {output_file} ({rows} rows in {elapsed:.2f}s, {rate:,.0f} rows/s)")
+        elif backend == 'sqlite':
+            conn.executescript(sql)
+            print("SQL executed successfully (no SELECT to export).")
+        else:
+            cursor = conn.cursor()
+            cursor.execute(sql)
+            print("SQL executed successfully (no SELECT to export).")
         conn.commit()
-        print("SQL executed successfully (no SELECT to export).")
-    conn.commit()
-    conn.close()
\ No newline at end of file
@@ -1,191 +1,286 @@
-import pandas as pd
+import os
+
 import yaml
 
-def convert(lines, file_name, input_format, output_format):
-    """Parse markdown syntax into hierarchical dictionary structure."""
-    result = {}
-    current_section = result
-    section_stack = [(result, 0)]  # (dict, level)
+from . import codec, instrument
+
+
+def _content_value(current_content, pending_list_items):
+    """Collapse accumulated content/list lines into a single value."""
+    if pending_list_items:
+        # If we have list items, they become the value
+        if len(pending_list_items) == 1:
+            # Single item becomes a string
+            return pending_list_items[0]
+        else:
+            # Multiple items become a comma-separated string or list
+            return ", ".join(pending_list_items)
+    elif current_content:
+        # Regular content
+        content_text = '\n'.join(current_content).strip()
+        return content_text if content_text else None
+    return None
+
+
+def iter_outline_events(lines):
+    """Parse markdown outline lines into a flat stream of events.
+
+    Consumes ``lines`` one at a time (a file handle works) and yields:
+
+    - ``('start', title, depth)`` when a header opens a section
+    - ``('value', title, text)`` for content belonging to the current header
+    - ``('end', title)`` when a section is closed
+
+    Only the open header path is kept in memory, so memory is bounded by
+    header depth rather than document size.
+    """
+    stack = []  # (title, level) of open headers
     current_content = []
     pending_list_items = []
-    
-    def save_content_and_lists():
-        """Save accumulated content and list items to current section."""
-        nonlocal current_content, pending_list_items
-        
-        if pending_list_items:
-            # If we have list items, they become the value
-            if len(pending_list_items) == 1:
-                # Single item becomes a string
-                return pending_list_items[0]
-            else:
-                # Multiple items become a comma-separated string or list
-                return ", ".join(pending_list_items)
-        elif current_content:
-            # Regular content
-            content_text = '\n'.join(current_content).strip()
-            return content_text if content_text else None
-        return None
-    
-    def assign_to_section(section, key, value):
-        """Assign value to section, handling existing keys."""
-        if value is not None:
-            if key in section:
-                # If key exists and has content, append or merge
-                existing = section[key]
-                if isinstance(existing, str) and isinstance(value, str):
-                    section[key] = f"{existing}\n{value}"
-                else:
-                    section[key] = value
-            else:
-                section[key] = value
-    
     last_header_key = None
-    
+
     for line in lines:
         line = line.rstrip('\n')
-        
+
         # Handle headers
         if line.startswith('#'):
             # Save any accumulated content/lists to the previous header
             if last_header_key and (current_content or pending_list_items):
-                content_value = save_content_and_lists()
+                content_value = _content_value(current_content, pending_list_items)
                 if content_value:
-                    parent_section = section_stack[-1][0]
-                    assign_to_section(parent_section, last_header_key, content_value)
+                    yield ('value', last_header_key, content_value)
                 current_content = []
                 pending_list_items = []
-            
+
             # Determine header level
             level = 0
             while level < len(line) and line[level] == '#':
                 level += 1
-            
+
             if level <= 6:  # Valid header levels
                 title = line[level:].strip()
-                
-                # Find appropriate parent level
-                while len(section_stack) > 1 and section_stack[-1][1] >= level:
-                    section_stack.pop()
-                
-                parent_section = section_stack[-1][0]
-                
-                # Create new section if it doesn't exist
-                if title not in parent_section:
-                    parent_section[title] = {}
-                
-                current_section = parent_section[title]
-                section_stack.append((current_section, level))
+
+                # Close sections at the same or deeper level
+                while stack and stack[-1][1] >= level:
+                    yield ('end', stack.pop()[0])
+
+                stack.append((title, level))
+                yield ('start', title, len(stack))
                 last_header_key = title
             else:
                 current_content.append(line)
-        
+
         # Handle lists
         elif line.strip().startswith(('- ', '* ', '+ ')):
             list_item = line.strip()[2:].strip()
             pending_list_items.append(list_item)
-        
+
         # Handle numbered lists
         elif line.strip() and line.strip()[0].isdigit() and '. ' in line:
             parts = line.strip().split('. ', 1)
             if len(parts) == 2:
                 list_item = parts[1].strip()
                 pending_list_items.append(list_item)
-        
+
         # Handle regular content
         elif line.strip():
             current_content.append(line)
-        
+
         # Handle empty lines (preserve spacing in content)
         else:
             if current_content:  # Only add if we have content already
                 current_content.append('')
-    
+
     # Save any remaining content/lists
     if last_header_key and (current_content or pending_list_items):
-        content_value = save_content_and_lists()
+        content_value = _content_value(current_content, pending_list_items)
         if content_value:
-            parent_section = section_stack[-1][0]
-            assign_to_section(parent_section, last_header_key, content_value)
-    
-    return result
+            yield ('value', last_header_key, content_value)
+
+    while stack:
+        yield ('end', stack.pop()[0])
+
+
+def parse_markdown_to_dict(lines):
+    """Parse markdown syntax into hierarchical dictionary structure."""
+    result = {}
+    section_stack = [result]
+    # Repeated headers merge into the same section; collect their content
+    # here and join once at the end instead of re-concatenating strings.
+    merged = {}
 
-def dict_to_markdown(data, level=0):
-    """Convert hierarchical dictionary back to markdown."""
-    result = []
-    
-    if isinstance(data, dict):
-        for key, value in data.items():
-            # Add header
-            header_prefix = '#' * (level + 1)
-            result.append(f"{header_prefix} {key}")
-            
-            if isinstance(value, dict):
-                # Recurse for nested structure
-                sub_content = dict_to_markdown(value, level + 1)
-                if sub_content:
-                    result.extend(sub_content)
-            elif isinstance(value, str):
-                # Check if it's a comma-separated list or regular content
-                if ', ' in value and not '\n' in value:
-                    # Likely a list, convert back to bullet points
-                    items = [item.strip() for item in value.split(',')]
-                    for item in items:
-                        result.append(f"- {item}")
+    for event in iter_outline_events(lines):
+        kind = event[0]
+        if kind == 'start':
+            title = event[1]
+            parent_section = section_stack[-1]
+            # Create new section if it doesn't exist
+            if title not in parent_section:
+                parent_section[title] = {}
+            section_stack.append(parent_section[title])
+        elif kind == 'value':
+            _, key, value = event
+            section = section_stack[-1]
+            existing = section.get(key)
+            slot = (id(section), key)
+            if isinstance(existing, str):
+                # If key exists and has content, append
+                if slot in merged:
+                    merged[slot][2].append(value)
                 else:
-                    # Regular content
-                    result.append(value)
-            elif isinstance(value, list):
-                # Handle list values
-                for item in value:
-                    result.append(f"- {item}")
-    
+                    merged[slot] = (section, key, [existing, value])
+            else:
+                section[key] = value
+        else:
+            section_stack.pop()
+
+    for section, key, parts in merged.values():
+        section[key] = '\n'.join(parts)
+
     return result
 
+
+class RepeatedHeaderError(ValueError):
+    """A key repeats within one section, which streaming cannot merge."""
+
+
+_STR_TAG = 'tag:yaml.org,2002:str'
+_resolver = yaml.resolver.Resolver()
+
+
+def _scalar_event(text):
+    """Build a ScalarEvent for a string, quoted only when yaml.dump would."""
+    implicit = (_resolver.resolve(yaml.ScalarNode, text, (True, False)) == _STR_TAG, True)
+    return yaml.ScalarEvent(None, _STR_TAG, implicit, text)
+
+
+def _value_events(siblings, key, parts):
+    """The key and text events of a header's content, registered among its siblings."""
+    if key in siblings[-1]:
+        raise RepeatedHeaderError(f"Repeated key '{key}' cannot be merged in streaming mode")
+    siblings[-1].add(key)
+    return _scalar_event(key), _scalar_event('\n'.join(parts))
+
+
+def _outline_yaml_events(lines):
+    """Translate outline events into PyYAML serialization events."""
+    # keys written so far in each open mapping: header titles and the
+    # text keys, which share the title of the header they belong to
+    siblings = [set()]
+    # content for the current header is held until the next event, since
+    # the parser may report it in more than one piece
+    pending = None
+
+    yield yaml.StreamStartEvent()
+    yield yaml.DocumentStartEvent(explicit=False)
+    yield yaml.MappingStartEvent(None, None, True, flow_style=False)
+
+    for event in iter_outline_events(lines):
+        kind = event[0]
+        if kind == 'value':
+            _, key, value = event
+            if pending is not None and pending[0] == key:
+                pending[1].append(value)
+                continue
+            if pending is not None:
+                yield from _value_events(siblings, *pending)
+            pending = (key, [value])
+            continue
+
+        if pending is not None:
+            yield from _value_events(siblings, *pending)
+            pending = None
+
+        if kind == 'start':
+            title = event[1]
+            if title in siblings[-1]:
+                # e.g. '# A' with text, then '## A': both are key A of section A
+                raise RepeatedHeaderError(f"Repeated key '{title}' cannot be merged in streaming mode")
+            siblings[-1].add(title)
+            siblings.append(set())
+            yield _scalar_event(title)
+            yield yaml.MappingStartEvent(None, None, True, flow_style=False)
+        else:
+            siblings.pop()
+            yield yaml.MappingEndEvent()
+
+    if pending is not None:
+        yield from _value_events(siblings, *pending)
+
+    yield yaml.MappingEndEvent()
+    yield yaml.DocumentEndEvent(explicit=False)
+    yield yaml.StreamEndEvent()
+
+
+def stream_markdown_to_yaml(lines, out):
+    """Convert markdown outline lines to YAML, writing to ``out`` as it goes.
+
+    Streaming counterpart of ``markdown_to_yaml``: outline events are fed
+    straight to the YAML emitter, so no section is held in memory; only the
+    keys written so far in each open section are, to detect repeats.
+
+    A key repeated within one section (a header repeated among its
+    siblings, or a sub-header titled like its parent when the parent has
+    text) cannot be merged into output that has already been written:
+    RepeatedHeaderError is raised when one is found, with the output
+    written so far left incomplete. Otherwise the output matches
+    ``markdown_to_yaml`` byte for byte.
+    """
+    codec.yaml_emit(_outline_yaml_events(lines), out)
+
+
 def markdown_to_yaml(lines):
     """Convert markdown syntax to YAML structure."""
     parsed_dict = parse_markdown_to_dict(lines)
-    return yaml.dump(parsed_dict, default_flow_style=False, allow_unicode=True, sort_keys=False)
-
-def yaml_to_markdown(lines, file_name):
-    """Convert YAML structure back to markdown syntax."""
-    yaml_content = ''.join(lines)
-    
-    try:
-        yaml_data = yaml.safe_load(yaml_content)
-        if yaml_data is None:
-            return ""
-        
-        markdown_lines = dict_to_markdown(yaml_data)
-        return '\n'.join(markdown_lines)
-        
-    except yaml.YAMLError as e:
-        print(f"Error parsing YAML: {e}")
-        return f"# Error parsing YAML: {e}"
-
-def convert(file_name, input_file, output_file):
-    with open(file_name, "r", encoding="utf-8") as file:
-        lines = file.readlines()
-
-    # Determine conversion direction based on file formats
-    if input_format.lower() == 'md' and output_format.lower() == 'yaml':
-        # Markdown to YAML conversion
-        print("Converting Markdown to YAML...")
-        result = markdown_to_yaml(lines)
-        
-    elif input_format.lower() == 'yaml' and output_format.lower() == 'md':
-        # YAML to Markdown conversion
-        print("Converting YAML to Markdown...")
-        result = yaml_to_markdown(lines)
-        
-    else:
-        print(f"Unsupported conversion: {input_format} to {output_format}")
-        print("Supported conversions: md -> yaml, yaml -> md")
-        exit(1)
-
-    # Write the result to output file
-    output_path = directory + output_file_name
-    with open(output_path, "w", encoding="utf-8") as output_file:
-        output_file.write(result)
-
-    print(f"✅ Conversion completed! Output saved to: {output_path}") 
\ No newline at end of file
+    return codec.yaml_dump(parsed_dict)
+
+def read(input_file):
+    """Parse the outline at input_file into its nested dict (chaining hook)."""
+    with instrument.stage("txt_yml.read"), open(input_file, "r", encoding="utf-8") as file:
+        instrument.count("bytes", os.path.getsize(input_file))
+        return parse_markdown_to_dict(file)
+
+def write(data, output_file):
+    """Write a parsed outline dict as YAML (chaining hook)."""
+    with instrument.stage("txt_yml.write"):
+        with open(output_file, "w", encoding="utf-8") as out:
+            codec.yaml_dump(data, out)
+        instrument.count("bytes", os.path.getsize(output_file))
+
+def convert(file_name, input_file, output_file, stream=None):
+    """Convert a markdown outline (.txt) to YAML.
+
+    With ``stream=True`` the outline is parsed line-by-line and YAML is
+    written incrementally, so large outlines never sit in memory whole.
+    An outline with repeated sibling headers is converted again in memory,
+    where they are merged. stream defaults to codec.streaming().
+    """
+    if stream is None:
+        stream = codec.streaming()
+    if stream:
+        try:
+            with instrument.stage("txt_yml.stream"):
+                with open(input_file, "r", encoding="utf-8") as file, \
+                        open(output_file, "w", encoding="utf-8") as out:
+                    stream_markdown_to_yaml(file, out)
+                instrument.count("bytes", os.path.getsize(input_file))
+        except RepeatedHeaderError as e:
+            print(f"{e}; converting {input_file} in memory instead")
+            stream = False
+    if not stream:
+        write(read(input_file), output_file)
+
+    print(f"✅ Conversion completed! Output saved to: {output_file}")
+
+
+if __name__ == "__main__":
+    import argparse
+    from pathlib import Path
+    parser = argparse.ArgumentParser(description="Convert a markdown outline to YAML")
+    parser.add_argument("input", help="input outline path")
+    parser.add_argument("--out", help="output YAML path (default: data/yml/<name>.yml)", default=None)
+    parser.add_argument("--stream", action="store_true", help="write the YAML while parsing instead of building it first")
+    args = parser.parse_args()
+
+    out = args.out or str(Path("data/yml") / f"{Path(args.input).stem}.yml")
+    convert(Path(args.input).stem, args.input, out, args.stream)
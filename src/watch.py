@@ -0,0 +1,218 @@
+"""watch.py
+
+Watch input directories and reconvert files as they are saved.
+
+Behavior:
+- Directories are watched with inotify (Linux, through libc; no extra
+  package needed), falling back to polling file mtimes elsewhere
+- Bursts of saves are debounced: a file is converted once no new change
+  has arrived for `debounce` seconds
+- The converter is loaded once and database converters (csv_sql, sql_csv)
+  use the configured connection pool, or keep one prompted-for connection
+  open, so a save costs no imports or prompts
+- Only the saved file's conversion chain is re-run; with a cache, saves
+  that do not change the content are skipped
+- Each conversion reports its own time and the latency from save to output
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+import traceback
+from functools import partial
+from importlib import import_module
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from . import get_converter
+from .cache import ConversionCache
+from .dbpool import close_pools, connect, default_backend, get_pool
+from .registry import lookup
+
+WATCH_BACKENDS = ('auto', 'inotify', 'poll')
+
+# inotify event mask bits (see inotify(7)): a file finished writing, or
+# was renamed into the directory (editors that save via a temp file)
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_EVENT = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """Report files with a given suffix written in dirs, using Linux inotify."""
+
+    def __init__(self, dirs: Iterable[Path], suffix: str):
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify is only available on Linux')
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            # CDLL(None) would load the running process, or fail with TypeError
+            raise OSError('libc not found')
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available on this platform')
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.suffix = suffix
+        self.dirs: Dict[int, Path] = {}
+        for d in dirs:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(d), _IN_CLOSE_WRITE | _IN_MOVED_TO)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f'cannot watch {d}')
+            self.dirs[wd] = Path(d)
+
+    def wait(self, timeout: float) -> Set[Path]:
+        """Return the files changed within timeout seconds (empty if none)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        buf = os.read(self.fd, 64 * 1024)
+        pos = 0
+        while pos < len(buf):
+            wd, _, _, length = _IN_EVENT.unpack_from(buf, pos)
+            pos += _IN_EVENT.size
+            name = buf[pos:pos + length].rstrip(b'\0').decode(errors='surrogateescape')
+            pos += length
+            if wd in self.dirs and name.endswith(self.suffix):
+                changed.add(self.dirs[wd] / name)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Report files with a given suffix written in dirs, by polling their mtimes."""
+
+    def __init__(self, dirs: Iterable[Path], suffix: str, interval: float = 0.5):
+        self.dirs = [Path(d) for d in dirs]
+        self.suffix = suffix
+        self.interval = interval
+        self.state = self._scan()
+
+    def _scan(self) -> Dict[Path, tuple]:
+        state = {}
+        for d in self.dirs:
+            for path in d.glob(f'*{self.suffix}'):
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                state[path] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def wait(self, timeout: float) -> Set[Path]:
+        """Return the files changed within timeout seconds (empty if none)."""
+        time.sleep(min(timeout, self.interval))
+        state = self._scan()
+        changed = {p for p, sig in state.items() if self.state.get(p) != sig}
+        self.state = state
+        return changed
+
+    def close(self):
+        pass
+
+
+def open_watcher(dirs: Iterable[Path], suffix: str, backend: str = 'auto', interval: float = 0.5):
+    """Create an inotify watcher, or a polling one if inotify is unavailable."""
+    if backend not in WATCH_BACKENDS:
+        raise ValueError(f"Unknown watch backend '{backend}', expected one of {', '.join(WATCH_BACKENDS)}")
+    dirs = list(dirs)
+    if backend != 'poll':
+        try:
+            return InotifyWatcher(dirs, suffix)
+        except OSError:
+            if backend == 'inotify':
+                raise
+    return PollingWatcher(dirs, suffix, interval)
+
+
+def warm_converter(input_format: str, output_format: str, keep_intermediates: bool = False,
+                   cache: Optional[ConversionCache] = None, backend: str = None,
+                   connections: Optional[Dict[str, object]] = None) -> Callable[[str, str, str], None]:
+    """Load the converter once; database converters get a connection kept in connections.
+
+    If a connection pool is configured (see dbpool.py), they borrow from it
+    instead. backend defaults to the configured one.
+    """
+    info = lookup(input_format, output_format)
+    if info is not None and info.database:
+        mod = import_module(info.module)
+        backend = backend or default_backend()
+        if get_pool(backend) is not None:
+            return partial(mod.convert, backend=backend)
+        # prompt for credentials once, now, rather than on every save
+        if connections is None:
+            connections = {}
+        if backend not in connections:
+            connections[backend] = connect(backend)
+        return partial(mod.convert, backend=backend, conn=connections[backend])
+    return get_converter(input_format, output_format, keep_intermediates, cache)
+
+
+def watch(input_format: str, output_format: str, dirs: List[Path], out_dir: Path, debounce: float = 0.2,
+          keep_intermediates: bool = False, cache: Optional[ConversionCache] = None, backend: str = None,
+          watcher: str = 'auto', poll_interval: float = 0.5, stop: Callable[[], bool] = None):
+    """Convert *.<input_format> files in dirs to out_dir each time they are saved.
+
+    Runs until interrupted, or until stop() returns True (checked between
+    waits).
+    """
+    connections = {}
+    convert = warm_converter(input_format, output_format, keep_intermediates, cache, backend, connections)
+    w = open_watcher(dirs, f'.{input_format}', watcher, poll_interval)
+    print(f'Watching {", ".join(str(d) for d in dirs)} for .{input_format} changes '
+          f'({type(w).__name__}); converting to .{output_format} in {out_dir}')
+    sys.stdout.flush()
+
+    # path -> when its latest change was seen
+    pending: Dict[Path, float] = {}
+    try:
+        while stop is None or not stop():
+            if pending:
+                timeout = max(0.0, debounce - (time.monotonic() - max(pending.values())))
+            else:
+                timeout = 1.0
+            changed = w.wait(timeout)
+            now = time.monotonic()
+            for path in changed:
+                pending[path] = now
+            if not pending or now - max(pending.values()) < debounce:
+                continue
+            for path in sorted(pending):
+                _run(convert, path, out_dir / f'{path.stem}.{output_format}')
+            pending.clear()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        w.close()
+        for conn in connections.values():
+            conn.close()
+        close_pools()
+
+
+def _run(convert: Callable[[str, str, str], None], input_file: Path, output_file: Path):
+    if not input_file.is_file():
+        # deleted or renamed away again before the debounce ran out
+        return
+    start = time.perf_counter()
+    try:
+        saved = input_file.stat().st_mtime
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        convert(input_file.stem, str(input_file), str(output_file))
+        latency = time.time() - saved
+        print(f'    ok {time.perf_counter() - start:8.3f}s  {latency:8.3f}s since save  {input_file}')
+    except Exception:
+        print(f'FAILED {time.perf_counter() - start:8.3f}s  {input_file}')
+        print('       ' + traceback.format_exc(limit=-3).strip().replace('\n', '\n       '))
+    sys.stdout.flush()
+
+
+__all__ = ["InotifyWatcher", "PollingWatcher", "open_watcher", "warm_converter", "watch", "WATCH_BACKENDS"]
@@ -0,0 +1,7 @@
+"""xlsm_csv.py
+
+Macro-enabled workbooks (.xlsm) store their sheets exactly as .xlsx files
+do; see xlsx_csv.py. The macros are not read.
+"""
+
+from .xlsx_csv import convert, iter_rows, sheet_names
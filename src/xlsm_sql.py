@@ -0,0 +1,7 @@
+"""xlsm_sql.py
+
+Macro-enabled workbooks (.xlsm) store their sheets exactly as .xlsx files
+do; see xlsx_sql.py. The macros are not read.
+"""
+
+from .xlsx_sql import convert, load_workbook
@@ -0,0 +1,316 @@
+"""xlsx_csv.py
+
+Export one sheet of an Excel workbook (.xlsx, or .xlsm: the macros are
+ignored) as CSV.
+
+An .xlsx file is a zip of XML parts. Rows are streamed from the sheet's
+part a few hundred kilobytes at a time and discarded once they have been
+yielded, so memory stays constant however many rows the sheet has; only
+the workbook's shared strings table is held in memory. No Excel library is
+needed.
+
+Behavior:
+- The first sheet is exported unless a sheet name is given
+- Shared, inline and formula strings are read as text, booleans as
+  TRUE/FALSE and numbers as Excel stored them
+- Numbers formatted as dates or times are written as ISO dates
+  (YYYY-MM-DD, YYYY-MM-DD HH:MM:SS, or HH:MM:SS)
+- Formulas are not evaluated; their cached result is used
+- Rows with no values (e.g. only formatting) are skipped, and rows are
+  padded to the width of the header row
+
+Run from the repository root as: python -m src.xlsx_csv <input.xlsx>
+"""
+
+import csv
+import posixpath
+import re
+import zipfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List
+from xml.etree.ElementTree import XML, iterparse
+
+from . import instrument
+
+_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+
+# built-in number formats that show dates, and the time-only ones among them
+_DATE_FORMAT_IDS = set(range(14, 23)) | set(range(27, 37)) | set(range(45, 48)) | set(range(50, 59))
+_TIME_FORMAT_IDS = {18, 19, 20, 21, 45, 46, 47}
+# quoted text, escaped characters and [Red]-style sections cannot make a format a date
+_FORMAT_LITERALS = re.compile(r'"[^"]*"|\\.|\[(?![hms]+\])[^\]]*\]')
+_ESCAPE = re.compile(r'_x([0-9A-Fa-f]{4})_')
+# the worksheet's start tag (with its namespace declarations) and the start of its rows
+_ROOT_TAG = re.compile(rb'<([A-Za-z_][\w.-]*:)?worksheet\b[^>]*>')
+_SHEET_DATA = re.compile(rb'<([A-Za-z_][\w.-]*:)?sheetData\b[^>]*?(/?)>')
+
+
+def _unescape(text: str) -> str:
+    # characters XML cannot hold are stored as _xHHHH_ (e.g. _x000D_ for CR)
+    return _ESCAPE.sub(lambda m: chr(int(m.group(1), 16)), text) if '_x' in text else text
+
+
+def _relationships(zf: zipfile.ZipFile, source: str):
+    """Return (id, part path, kind) for each relationship of the part at source ('' for the package)."""
+    folder, name = posixpath.split(source)
+    try:
+        f = zf.open(posixpath.join(folder, '_rels', name + '.rels'))
+    except KeyError:
+        return []
+    rels = []
+    for _, elem in iterparse(f):
+        if elem.tag == _PKG_REL:
+            target = elem.get('Target')
+            # targets are relative to the source part's folder, or absolute from the zip root
+            path = target[1:] if target.startswith('/') else posixpath.normpath(posixpath.join(folder, target))
+            rels.append((elem.get('Id'), path, elem.get('Type').rsplit('/', 1)[-1]))
+    return rels
+
+
+class _Workbook:
+    """The parts of a workbook needed to read its sheets."""
+
+    def __init__(self, zf: zipfile.ZipFile):
+        self.zf = zf
+        self.path = next((p for _, p, kind in _relationships(zf, '') if kind == 'officeDocument'), 'xl/workbook.xml')
+        rels = _relationships(zf, self.path)
+        parts = {rid: path for rid, path, _ in rels}
+        kinds = {kind: path for _, path, kind in rels}
+        self.shared_strings_path = kinds.get('sharedStrings')
+        self.styles_path = kinds.get('styles')
+
+        self.ns = ''
+        self.sheets: Dict[str, str] = {}
+        self.date1904 = False
+        for _, elem in iterparse(zf.open(self.path)):
+            tag = elem.tag
+            if tag.endswith('}sheet'):
+                # transitional and strict workbooks differ in namespace only
+                self.ns = tag[:-len('sheet')]
+                self.sheets[elem.get('name')] = parts[elem.get(_REL + 'id')]
+            elif tag.endswith('}workbookPr'):
+                self.date1904 = elem.get('date1904') in ('1', 'true')
+
+    def shared_strings(self) -> List[str]:
+        if self.shared_strings_path is None:
+            return []
+        ns = self.ns
+        strings = []
+        with instrument.stage('xlsx_csv.shared_strings'):
+            for _, elem in iterparse(self.zf.open(self.shared_strings_path)):
+                if elem.tag == ns + 'si':
+                    strings.append(_string_item(elem, ns))
+                    elem.clear()
+            instrument.count('strings', len(strings))
+        return strings
+
+    def date_styles(self) -> Dict[int, bool]:
+        """Map the index of each date-formatted cell style to True if it shows a time only."""
+        if self.styles_path is None:
+            return {}
+        ns = self.ns
+        custom: Dict[int, str] = {}
+        styles: Dict[int, bool] = {}
+        in_cell_xfs = False
+        index = 0
+        for event, elem in iterparse(self.zf.open(self.styles_path), ('start', 'end')):
+            if elem.tag == ns + 'cellXfs':
+                in_cell_xfs = event == 'start'
+            elif event == 'end' and elem.tag == ns + 'numFmt':
+                custom[int(elem.get('numFmtId'))] = elem.get('formatCode', '')
+            elif event == 'end' and elem.tag == ns + 'xf' and in_cell_xfs:
+                fmt_id = int(elem.get('numFmtId', 0))
+                if fmt_id in custom:
+                    code = _FORMAT_LITERALS.sub('', custom[fmt_id].split(';')[0]).lower()
+                    if any(c in code for c in 'dmyhs'):
+                        styles[index] = not any(c in code for c in 'dy')
+                elif fmt_id in _DATE_FORMAT_IDS:
+                    styles[index] = fmt_id in _TIME_FORMAT_IDS
+                index += 1
+        return styles
+
+
+def _string_item(elem, ns: str) -> str:
+    """Text of a shared or inline string: plain <t>, or the <t> of each rich text run."""
+    t = elem.find(ns + 't')
+    if t is not None:
+        return _unescape(t.text or '')
+    # phonetic runs (<rPh>) are not part of the value
+    return _unescape(''.join(r.findtext(ns + 't', '') for r in elem.iterfind(ns + 'r')))
+
+
+class _Columns(dict):
+    """Map the letters of a cell reference (AB for AB12) to a 0-based column index."""
+
+    def __missing__(self, letters: str) -> int:
+        n = 0
+        for c in letters:
+            n = n * 26 + ord(c) - 64
+        self[letters] = n - 1
+        return n - 1
+
+
+def _excel_date(serial: float, date1904: bool, time_only: bool) -> str:
+    if date1904:
+        epoch = datetime(1904, 1, 1)
+    else:
+        # Excel counts a 29 February 1900 that never was
+        epoch = datetime(1899, 12, 30) if serial >= 61 else datetime(1899, 12, 31)
+    seconds = round(serial * 86400)
+    value = epoch + timedelta(seconds=seconds)
+    if time_only:
+        return value.strftime('%H:%M:%S')
+    if seconds % 86400 == 0:
+        return value.strftime('%Y-%m-%d')
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _row_elements(f, chunk_size: int = 1 << 18):
+    """Yield the <row> elements of the worksheet part read from f, a chunk at a time.
+
+    Rather than an event per XML element (iterparse), the part is cut after
+    the last </row> of each chunk and the piece is parsed whole by the C
+    parser, wrapped in the worksheet's start tag so namespace prefixes still
+    resolve. Only one piece's elements are alive at a time.
+    """
+    buf = b''
+    while True:
+        chunk = f.read(chunk_size)
+        buf += chunk
+        root = _ROOT_TAG.search(buf)
+        data = _SHEET_DATA.search(buf, root.end()) if root else None
+        if data or not chunk:
+            break
+    if data is None or data.group(2):
+        # no <sheetData>, or an empty <sheetData/>
+        return
+    prefix = root.group(1) or b''
+    head, tail = root.group(0), b'</' + prefix + b'worksheet>'
+    row_end, data_end = b'</' + prefix + b'row>', b'</' + prefix + b'sheetData>'
+
+    buf = buf[data.end():]
+    while True:
+        end = buf.find(data_end)
+        if end >= 0:
+            piece, buf = buf[:end], None
+        else:
+            cut = buf.rfind(row_end)
+            chunk = f.read(chunk_size)
+            if cut < 0:
+                if not chunk:
+                    raise ValueError('Worksheet XML ends inside <sheetData>')
+                buf += chunk
+                continue
+            cut += len(row_end)
+            piece, buf = buf[:cut], buf[cut:] + chunk
+        yield from XML(head + piece + tail)
+        if buf is None:
+            return
+
+
+def sheet_names(input_file: str) -> List[str]:
+    """Names of the sheets of the workbook at input_file, in order."""
+    with zipfile.ZipFile(input_file) as zf:
+        return list(_Workbook(zf).sheets)
+
+
+def iter_rows(input_file: str, sheet: str = None) -> Iterator[List[str]]:
+    """Yield the rows of a sheet (the first by default) as lists of strings.
+
+    Empty cells are ''. Rows with no values are skipped. Raises KeyError for
+    an unknown sheet name.
+    """
+    with zipfile.ZipFile(input_file) as zf:
+        book = _Workbook(zf)
+        if sheet is None:
+            if not book.sheets:
+                return
+            part = next(iter(book.sheets.values()))
+        elif sheet in book.sheets:
+            part = book.sheets[sheet]
+        else:
+            raise KeyError(f"No sheet '{sheet}' in {input_file}; sheets are {', '.join(book.sheets)}")
+
+        strings = book.shared_strings()
+        date_styles = book.date_styles()
+        ns = book.ns
+        ROW, C, V, IS = ns + 'row', ns + 'c', ns + 'v', ns + 'is'
+        columns = _Columns()
+
+        with zf.open(part) as f:
+            for elem in _row_elements(f):
+                if elem.tag != ROW:
+                    continue
+                row: List[str] = []
+                for c in elem.iterfind(C):
+                    ref = c.get('r')
+                    col = columns[ref.rstrip('0123456789')] if ref else len(row)
+                    kind = c.get('t', 'n')
+                    if kind == 'inlineStr':
+                        is_ = c.find(IS)
+                        value = _string_item(is_, ns) if is_ is not None else ''
+                    else:
+                        value = c.findtext(V)
+                        if value is None:
+                            continue
+                        if kind == 's':
+                            value = strings[int(value)]
+                        elif kind == 'b':
+                            value = 'TRUE' if value == '1' else 'FALSE'
+                        elif kind == 'n' and date_styles:
+                            style = int(c.get('s', 0))
+                            if style in date_styles:
+                                value = _excel_date(float(value), book.date1904, date_styles[style])
+                        elif kind in ('str', 'e'):
+                            value = _unescape(value)
+                    if value == '':
+                        continue
+                    if col == len(row):
+                        row.append(value)
+                    elif col > len(row):
+                        row.extend([''] * (col - len(row)))
+                        row.append(value)
+                    else:
+                        row[col] = value
+                if row:
+                    yield row
+
+
+def convert(file_name, input_file, output_file, sheet=None):
+    """Write one sheet (the first by default) of the workbook input_file to output_file as CSV."""
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    rows = iter_rows(input_file, sheet)
+    count = 0
+    # rows are parsed and written in turn: one stage
+    with instrument.stage('xlsx_csv.rows'), open(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        header = next(rows, None)
+        if header is not None:
+            writer.writerow(header)
+            width = len(header)
+            for row in rows:
+                if len(row) < width:
+                    row.extend([''] * (width - len(row)))
+                writer.writerow(row)
+                count += 1
+        instrument.count('rows', count)
+    print(f"Workbook {input_file} exported to {output_file} ({count} rows)")
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Export a sheet of an .xlsx/.xlsm workbook as CSV')
+    parser.add_argument('input', help='input workbook path')
+    parser.add_argument('--out', help='output CSV path (default: data/csv/<name>.csv)', default=None)
+    parser.add_argument('--sheet', help='sheet name (default: the first sheet)', default=None)
+    parser.add_argument('--list', action='store_true', help='list the sheet names and exit')
+    args = parser.parse_args()
+
+    if args.list:
+        print('\n'.join(sheet_names(args.input)))
+    else:
+        out = args.out or str(Path('data/csv') / f'{Path(args.input).stem}.csv')
+        convert(Path(args.input).stem, args.input, out, args.sheet)
@@ -0,0 +1,76 @@
+"""xlsx_sql.py
+
+Load one sheet of an Excel workbook (.xlsx or .xlsm) into a database table
+(named file_name) and export the same rows as an SQL dump.
+
+The sheet's rows are streamed by xlsx_csv.iter_rows straight into the bulk
+loading path of csv_sql.py (COPY on Postgres, executemany on SQLite), with
+no intermediate CSV file: the first row is the header, empty cells are
+loaded as NULL, and memory stays constant however many rows the sheet has.
+
+Header cells are free text, so table and column names are quoted as
+json_sql.py quotes them; a blank header cell is named after its column
+(column_3 for C).
+
+Run from the repository root as: python -m src.xlsx_sql <input.xlsx>
+"""
+
+from pathlib import Path
+
+from .csv_sql import BACKENDS, load_rows, table_rows
+from .dbpool import connection, default_backend
+from .xlsx_csv import iter_rows
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def load_workbook(conn, input_file, table, output_file, backend='postgres', sheet=None, chunk_size=10000,
+                  pipeline_depth=2):
+    """Load a sheet (the first by default) of input_file into table on conn and write the SQL dump.
+
+    Returns the number of rows loaded. Raises ValueError if the sheet is empty.
+    """
+    rows = iter_rows(input_file, sheet)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError(f"{f'Sheet {sheet}' if sheet else 'The first sheet'} of {input_file} has no rows to load")
+    cols = [_quote(name or f'column_{i}') for i, name in enumerate(header, 1)]
+    with open(output_file, 'w', encoding='utf-8') as dump:
+        return load_rows(conn, cols, table_rows(rows, len(cols)), _quote(table), dump, backend, chunk_size,
+                         pipeline_depth)
+
+
+def convert(file_name, input_file, output_file, backend=None, sheet=None, chunk_size=10000, conn=None,
+            pipeline_depth=2):
+    """
+    Import a sheet of a workbook into a database table (named file_name) and export as SQL dump.
+
+    conn is an open connection to reuse (and leave open); by default one is
+    borrowed from the configured pool, or opened from prompted credentials
+    and closed afterwards. backend defaults to the configured one.
+    """
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+
+    backend = backend or default_backend()
+    with connection(backend, conn) as conn:
+        rows = load_workbook(conn, input_file, file_name, output_file, backend, sheet, chunk_size, pipeline_depth)
+    print(f"Workbook {input_file} imported into {file_name} ({rows} rows) and SQL dump written to {output_file}")
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Load a sheet of an .xlsx/.xlsm workbook into a database')
+    parser.add_argument('input', help='input workbook path')
+    parser.add_argument('--out', help='output SQL dump path (default: data/sql/<name>.sql)', default=None)
+    parser.add_argument('--sheet', help='sheet name (default: the first sheet)', default=None)
+    parser.add_argument('--table', help='table name (default: the workbook name)', default=None)
+    parser.add_argument('--backend', choices=BACKENDS, default=None,
+                        help='database backend (default: the configured one, else postgres)')
+    args = parser.parse_args()
+
+    name = Path(args.input).stem
+    out = args.out or str(Path('data/sql') / f'{name}.sql')
+    convert(args.table or name, args.input, out, args.backend, args.sheet)
@@ -1,9 +1,19 @@
-import re,os,json
-import yaml
+import os
 
-def convert(input_file, output_file, file_name=None):
-    with open(input_file, "r", encoding="utf-8") as f:
-        data = yaml.safe_load(f)
+from . import codec, instrument
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
\ No newline at end of file
+def read(input_file):
+    """Load the YAML document at input_file (chaining hook)."""
+    with instrument.stage("yml_json.read"), open(input_file, "r", encoding="utf-8") as f:
+        instrument.count("bytes", os.path.getsize(input_file))
+        return codec.yaml_load(f)
+
+def write(data, output_file):
+    """Write loaded YAML data as JSON (chaining hook)."""
+    with instrument.stage("yml_json.write"):
+        with open(output_file, "w", encoding="utf-8") as f:
+            codec.json_dump(data, f)
+        instrument.count("bytes", os.path.getsize(output_file))
+
+def convert(file_name, input_file, output_file):
+    write(read(input_file), output_file)
@@ -0,0 +1,207 @@
+"""yml_txt.py
+
+Convert YAML back to the markdown outline syntax read by txt_yml.py, for
+round-trip editing.
+
+Behavior:
+- Nested mappings become headers: # for top-level keys, ## below, ...
+- The text of a header, which the txt_yml parser stores under the header's
+  own title inside its section, is written directly below the header
+- A one-line value made of ', '-joined items (how the parser stores a
+  bulleted list) is written as '- ' bullets; other text line by line
+- Lines are written to the output as they are generated, never collected
+  into a list; with stream=True the YAML is also read as events instead of
+  being loaded, so memory depends only on the nesting depth
+
+Parsing the output with txt_yml gives back the YAML's structure exactly
+for anything txt_yml wrote. Other YAML is written on a best-effort basis:
+e.g. text under a key that is not its section's title becomes a header of
+its own, and numbers are written as text.
+
+Run from the repository root as: python -m src.yml_txt <input.yml>
+"""
+
+import os
+from typing import Any, Iterator
+
+import yaml
+
+from . import codec, instrument
+
+
+def _is_text_line(line: str) -> bool:
+    """Whether the txt_yml parser reads line back as text, not as a header or list item."""
+    if line.startswith('#'):
+        return len(line) - len(line.lstrip('#')) > 6
+    stripped = line.strip()
+    if stripped.startswith(('- ', '* ', '+ ')):
+        return False
+    return not (stripped[:1].isdigit() and '. ' in line)
+
+
+class _Emitter:
+    """Header and text lines of one outline; headers after the first get a blank line before them."""
+
+    def __init__(self):
+        self.first = True
+
+    def header(self, key: Any, level: int) -> str:
+        # a blank line between sections; the parser ignores it
+        line = f"{'#' * level} {key}\n"
+        if self.first:
+            self.first = False
+            return line
+        return '\n' + line
+
+    def text(self, value: Any, title: Any, level: int) -> Iterator[str]:
+        """Lines for the text of the header title (at level)."""
+        if value is None:
+            return
+        if isinstance(value, list):
+            for item in value:
+                yield f'- {item}\n'
+            return
+        text = value if isinstance(value, str) else str(value)
+        if ', ' in text and '\n' not in text:
+            items = text.split(', ')
+            # bullets only when the parser joins them back into the same text
+            if all(item and item == item.strip() for item in items):
+                for item in items:
+                    yield f'- {item}\n'
+                return
+        # Text merged from repeated headers can hold joined lists, i.e. lines
+        # that would be read back as list items: write those as a bullet.
+        # The parser keeps only the bullets of a run that mixes them with text,
+        # so the header is repeated between such runs.
+        last = None
+        for line in text.split('\n'):
+            if _is_text_line(line):
+                if last == 'list' and level:
+                    yield self.header(title, level)
+                yield f'{line}\n'
+                last = 'text'
+            else:
+                if last and level:
+                    yield self.header(title, level)
+                yield f'- {line}\n'
+                last = 'list'
+
+    def entry(self, key: Any, value: Any, title: Any, level: int, has_children: bool) -> Iterator[str]:
+        """Lines for a non-mapping value of key in the section title (at level)."""
+        if level and key == title:
+            if has_children:
+                # text stored after a subsection: reopen the section, the parser merges it
+                yield self.header(title, level)
+            yield from self.text(value, title, level)
+        else:
+            yield self.header(key, level + 1)
+            yield from self.text(value, key, level + 1)
+
+
+def iter_outline_lines(data: Any) -> Iterator[str]:
+    """Yield the outline lines (with newlines) for loaded YAML data."""
+    emitter = _Emitter()
+    if isinstance(data, dict):
+        yield from _mapping_lines(emitter, data, None, 0)
+    else:
+        yield from emitter.text(data, None, 0)
+
+
+def _mapping_lines(emitter: _Emitter, data: dict, title: Any, level: int) -> Iterator[str]:
+    has_children = False
+    for key, value in data.items():
+        if isinstance(value, dict):
+            yield emitter.header(key, level + 1)
+            yield from _mapping_lines(emitter, value, key, level + 1)
+            has_children = True
+        else:
+            yield from emitter.entry(key, value, title, level, has_children)
+
+
+def iter_outline_lines_from_yaml(stream) -> Iterator[str]:
+    """Yield the outline lines for the YAML read from stream, without loading it whole.
+
+    Mappings are followed event by event; only leaf values (text, lists)
+    are built, with the same rules as yaml.safe_load.
+    """
+    loader = codec.yaml_event_loader(stream)
+    try:
+        loader.get_event()
+        if loader.check_event(yaml.StreamEndEvent):
+            return
+        loader.get_event()
+        emitter = _Emitter()
+        if loader.check_event(yaml.MappingStartEvent):
+            yield from _event_mapping_lines(loader, emitter, None, 0)
+        elif not loader.check_event(yaml.DocumentEndEvent):
+            yield from emitter.text(_leaf(loader), None, 0)
+    finally:
+        loader.dispose()
+
+
+def _leaf(loader) -> Any:
+    # construct_document, unlike construct_object, forgets the nodes it built
+    return loader.construct_document(loader.compose_node(None, None))
+
+
+def _event_mapping_lines(loader, emitter: _Emitter, title: Any, level: int) -> Iterator[str]:
+    loader.get_event()
+    has_children = False
+    while not loader.check_event(yaml.MappingEndEvent):
+        key = _leaf(loader)
+        if loader.check_event(yaml.MappingStartEvent):
+            yield emitter.header(key, level + 1)
+            yield from _event_mapping_lines(loader, emitter, key, level + 1)
+            has_children = True
+        else:
+            yield from emitter.entry(key, _leaf(loader), title, level, has_children)
+    loader.get_event()
+
+
+# chaining hooks (see planner.py)
+def read(input_file):
+    """Load the YAML at input_file (chaining hook)."""
+    with instrument.stage('yml_txt.read'), open(input_file, 'r', encoding='utf-8') as f:
+        instrument.count('bytes', os.path.getsize(input_file))
+        return codec.yaml_load(f)
+
+
+def write(data, output_file):
+    """Write loaded YAML data as an outline (chaining hook)."""
+    with instrument.stage('yml_txt.write'):
+        with open(output_file, 'w', encoding='utf-8') as out:
+            out.writelines(iter_outline_lines(data))
+        instrument.count('bytes', os.path.getsize(output_file))
+
+
+def convert(file_name, input_file, output_file, stream=None):
+    """Convert YAML to a markdown outline (.txt).
+
+    With stream=True the YAML is read event by event rather than loaded,
+    for outlines too large to hold in memory; the output is the same.
+    stream defaults to codec.streaming().
+    """
+    if stream is None:
+        stream = codec.streaming()
+    if stream:
+        with instrument.stage('yml_txt.stream'):
+            with open(input_file, 'r', encoding='utf-8') as f, open(output_file, 'w', encoding='utf-8') as out:
+                out.writelines(iter_outline_lines_from_yaml(f))
+            instrument.count('bytes', os.path.getsize(input_file))
+    else:
+        write(read(input_file), output_file)
+
+    print(f"✅ Conversion completed! Output saved to: {output_file}")
+
+
+if __name__ == '__main__':
+    import argparse
+    from pathlib import Path
+    parser = argparse.ArgumentParser(description='Convert YAML to a markdown outline')
+    parser.add_argument('input', help='input YAML file path')
+    parser.add_argument('--out', help='output outline path (default: data/txt/<name>.txt)', default=None)
+    parser.add_argument('--stream', action='store_true', help='read the YAML as events instead of loading it')
+    args = parser.parse_args()
+
+    out = args.out or str(Path('data/txt') / f'{Path(args.input).stem}.txt')
+    convert(Path(args.input).stem, args.input, out, args.stream)